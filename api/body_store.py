@@ -0,0 +1,192 @@
+# Content-addressed store for request/response bodies (table `body_blobs`).
+# - Each distinct body is stored once, keyed by its SHA-256, zlib-compressed,
+#   with its uncompressed size; `bodies` rows only point at blob ids.
+# - Triggers on `bodies` keep `refcount` current and delete a blob when its
+#   last reference goes away.
+# - read() can return just the first N bytes (decompressing only that much,
+#   via incremental blob I/O) or a pretty-printed excerpt of them.
+
+import hashlib
+import zlib
+from sqlalchemy.engine import Connection
+from .compression import pack
+
+_READ_CHUNK = 16 * 1024  # compressed bytes per blob read for previews
+_INDENT = "  "
+
+
+def digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode()).digest()
+
+
+def install(conn: Connection) -> None:
+    """Create the refcount triggers on `bodies`."""
+    for name in ("bodies_ai", "bodies_ad", "bodies_au"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    incr = ("UPDATE body_blobs SET refcount = refcount + 1 WHERE id = new.req_blob_id;\n"
+            "      UPDATE body_blobs SET refcount = refcount + 1 WHERE id = new.res_blob_id;")
+    decr = ("UPDATE body_blobs SET refcount = refcount - 1 WHERE id = old.req_blob_id;\n"
+            "      UPDATE body_blobs SET refcount = refcount - 1 WHERE id = old.res_blob_id;\n"
+            "      DELETE FROM body_blobs WHERE id IN (old.req_blob_id, old.res_blob_id) AND refcount <= 0;")
+    conn.exec_driver_sql(f"""
+    CREATE TRIGGER bodies_ai AFTER INSERT ON bodies BEGIN
+      {incr}
+    END;
+    """)
+    conn.exec_driver_sql(f"""
+    CREATE TRIGGER bodies_ad AFTER DELETE ON bodies BEGIN
+      {decr}
+    END;
+    """)
+    # Increment first so a blob kept by the new row is never deleted in between
+    conn.exec_driver_sql(f"""
+    CREATE TRIGGER bodies_au AFTER UPDATE OF req_blob_id, res_blob_id ON bodies BEGIN
+      {incr}
+      {decr}
+    END;
+    """)
+
+
+def put_many(conn: Connection, texts: list[str | None], known: dict[bytes, int] | None = None) -> list[int | None]:
+    """
+    Blob ids for `texts` (None stays None), storing only contents not seen before.
+    `known` is an optional hash -> id cache owned by the caller; it must not outlive
+    the transaction, since a blob can disappear once its last reference is deleted.
+    """
+    known = {} if known is None else known
+    hashes = [digest(t) if t is not None else None for t in texts]
+    missing = {h for h in hashes if h is not None and h not in known}
+    if missing:
+        # IN lists of 500 stay under SQLite's bound-parameter limit
+        pending = list(missing)
+        for i in range(0, len(pending), 500):
+            part = pending[i:i + 500]
+            marks = ",".join("?" * len(part))
+            known.update(conn.exec_driver_sql(
+                f"SELECT hash, id FROM body_blobs WHERE hash IN ({marks})", tuple(part)
+            ).all())
+        new = {}
+        for h, t in zip(hashes, texts):
+            if h is not None and h not in known and h not in new:
+                new[h] = t
+        if new:
+            conn.exec_driver_sql(
+                "INSERT INTO body_blobs(hash, size, refcount, data_z) VALUES (?, ?, 0, ?)",
+                [(h, len(t.encode()), pack(t)) for h, t in new.items()],
+            )
+            # One executemany under the write lock takes consecutive rowids
+            last = conn.exec_driver_sql("SELECT last_insert_rowid()").scalar()
+            known.update(zip(new, range(last - len(new) + 1, last + 1)))
+    return [known[h] if h is not None else None for h in hashes]
+
+
+def migrate(conn: Connection, chunk: int = 5000) -> bool:
+    """Move text columns of an older `bodies` table into the blob store. True if it did."""
+    have = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(bodies)")}
+    if "req_body_json" not in have:
+        return False
+    install(conn)  # the update trigger counts the references set below
+    known: dict[bytes, int] = {}
+    after = -1
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT log_id, req_body_json, res_body_json FROM bodies WHERE log_id > ? ORDER BY log_id LIMIT ?",
+            (after, chunk),
+        ).all()
+        if not rows:
+            break
+        ids = put_many(conn, [t for _, req, res in rows for t in (req, res)], known)
+        conn.exec_driver_sql(
+            "UPDATE bodies SET req_blob_id = ?, res_blob_id = ? WHERE log_id = ?",
+            [(ids[2 * i], ids[2 * i + 1], log_id) for i, (log_id, _, _) in enumerate(rows)],
+        )
+        after = rows[-1][0]
+    conn.exec_driver_sql("ALTER TABLE bodies DROP COLUMN req_body_json")
+    conn.exec_driver_sql("ALTER TABLE bodies DROP COLUMN res_body_json")
+    return True
+
+
+def _head(conn: Connection, blob_id: int, limit: int) -> bytes:
+    """First `limit` uncompressed bytes of a blob, reading and inflating only as much as needed."""
+    raw = conn.connection.driver_connection
+    d = zlib.decompressobj()
+    out = bytearray()
+    pending = b""
+    with raw.blobopen("body_blobs", "data_z", blob_id, readonly=True) as blob:
+        while len(out) < limit and not d.eof:
+            if not pending:
+                pending = blob.read(_READ_CHUNK)
+                if not pending:
+                    break
+            out += d.decompress(pending, limit - len(out))
+            pending = d.unconsumed_tail
+    return bytes(out)
+
+
+def _pretty(text: str, limit: float) -> tuple[str, bool]:
+    """
+    Indent JSON text (possibly cut off mid-document) without parsing it.
+    Returns (at most `limit` chars, whether output was cut at the limit).
+    """
+    out: list[str] = []
+    size = 0
+    depth = 0
+    in_str = esc = False
+    prev = ""  # last character outside strings (a closing quote counts)
+    for ch in text:
+        was_in_str = in_str
+        if in_str:
+            piece = ch
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch in " \t\r\n":
+            continue
+        elif ch == '"':
+            in_str = True
+            piece = ch
+        elif ch in "{[":
+            depth += 1
+            piece = ch + "\n" + _INDENT * depth
+        elif ch in "}]":
+            depth = max(depth - 1, 0)
+            if prev in ("{", "["):
+                # Empty container: undo the line break after the opener
+                size -= len(out[-1]) - 1
+                out[-1] = prev
+                piece = ch
+            else:
+                piece = "\n" + _INDENT * depth + ch
+        elif ch == ",":
+            piece = ",\n" + _INDENT * depth
+        elif ch == ":":
+            piece = ": "
+        else:
+            piece = ch
+        if not (was_in_str and in_str):
+            prev = ch
+        out.append(piece)
+        size += len(piece)
+        if size > limit:
+            return "".join(out)[:int(limit)], True
+    return "".join(out), False
+
+
+def read(conn: Connection, blob_id: int, preview: int | None = None, pretty: bool = False) -> dict:
+    """
+    {"json", "size", "truncated"} for a blob. With `preview`, only the first `preview`
+    bytes are inflated; `pretty` indents that excerpt (cut to `preview` chars).
+    """
+    size = conn.exec_driver_sql("SELECT size FROM body_blobs WHERE id = ?", (blob_id,)).scalar()
+    if size is None:
+        return {"json": None, "size": 0, "truncated": False}
+    limit = size if preview is None else min(preview, size)
+    text = _head(conn, blob_id, limit).decode("utf-8", errors="ignore")  # drops a split last char
+    truncated = limit < size
+    if pretty:
+        text, cut = _pretty(text, preview if preview is not None else float("inf"))
+        truncated = truncated or cut
+    return {"json": text, "size": size, "truncated": truncated}
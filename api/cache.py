@@ -0,0 +1,96 @@
+# Data generation counter and in-process result caches keyed on it.
+# - `data_state.generation` goes up in the same transaction as every write that can
+#   change what a read returns (import commits, demo seed, read-state changes).
+# - Cached results are stored under (generation, key), so a write makes all older
+#   entries unreachable at once; they age out of the LRU on their own.
+# - The counter lives in SQLite, so every API process and import job agrees on it.
+# - `changed_us` records when it last moved (epoch microseconds), for Last-Modified.
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+from sqlalchemy.engine import Connection
+from parser.timestamps import now_epoch_us
+
+FACET_CACHE_SIZE = int(os.getenv("FACET_CACHE_SIZE", "256"))  # entries; 0 disables
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 << 20)))  # serialized bodies; 0 disables
+
+
+def install(conn: Connection) -> None:
+    """Create the single-row generation table."""
+    conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS data_state (generation INTEGER NOT NULL)")
+    have = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(data_state)")}
+    if "changed_us" not in have:
+        conn.exec_driver_sql("ALTER TABLE data_state ADD COLUMN changed_us INTEGER")
+    if conn.exec_driver_sql("SELECT count(*) FROM data_state").scalar() == 0:
+        conn.exec_driver_sql("INSERT INTO data_state(generation) VALUES (0)")
+    conn.exec_driver_sql("UPDATE data_state SET changed_us = ? WHERE changed_us IS NULL", (now_epoch_us(),))
+
+
+def generation(conn: Connection) -> int:
+    return conn.exec_driver_sql("SELECT generation FROM data_state").scalar()
+
+
+def state(conn: Connection) -> tuple[int, int]:
+    """(generation, changed_us) in one read."""
+    return tuple(conn.exec_driver_sql("SELECT generation, changed_us FROM data_state").one())
+
+
+def bump(conn: Connection) -> None:
+    """Invalidate cached reads; call inside the writing transaction, before commit."""
+    conn.exec_driver_sql("UPDATE data_state SET generation = generation + 1, changed_us = ?", (now_epoch_us(),))
+
+
+class LRUCache:
+    """
+    Least-recently-used map with hit/miss counters, safe to share between threads.
+    `maxsize` bounds the total `weigh(value)` of the entries (1 per entry by default).
+    """
+
+    def __init__(self, maxsize: int, weigh: Callable[[Any], int] | None = None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.weight = 0
+        self._weigh = weigh or (lambda value: 1)
+        self._data: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Computed outside the lock; two threads missing the same key both compute it
+        value = compute()
+        w = self._weigh(value)
+        if 0 < w <= self.maxsize:
+            with self._lock:
+                old = self._data.pop(key, None)
+                if old is not None:
+                    self.weight -= old[1]
+                self._data[key] = (value, w)
+                self.weight += w
+                while self.weight > self.maxsize:
+                    _, (_, ow) = self._data.popitem(last=False)
+                    self.weight -= ow
+                    self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "weight": self.weight, "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+facets = LRUCache(FACET_CACHE_SIZE)
+responses = LRUCache(RESPONSE_CACHE_BYTES, weigh=len)
@@ -0,0 +1,19 @@
+# zlib helpers for JSON text kept out of the hot `logs` table.
+# Also registered as SQL functions deflate()/inflate() on every connection (api.db),
+# so triggers, views and exports can read compressed columns in SQL.
+
+import os
+import zlib
+
+ZLIB_LEVEL = int(os.getenv("ZLIB_LEVEL", "6"))
+# 2 KiB window: log records are small, and most of a default-window compress() call
+# goes into setting up its 32 KiB window; decompress() reads the size from the header
+_WBITS = 11
+
+
+def pack(text: str | None) -> bytes | None:
+    return None if text is None else zlib.compress(text.encode(), ZLIB_LEVEL, _WBITS)
+
+
+def unpack(blob: bytes | None) -> str | None:
+    return None if blob is None else zlib.decompress(blob).decode()
@@ -1,54 +1,203 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
+from .compression import pack, unpack
 
 # DB file path from env; ensures ./data exists
 DB_PATH = os.getenv("DB_PATH", "./data/logs.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-# SQLite engine; check_same_thread False to allow use in FastAPI threads
+# Pragmas applied to every connection. WAL lets readers keep going while an import
+# writes; NORMAL sync is durable across app crashes (not power loss) in WAL mode.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-32768"))  # pages, or KiB if negative
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+# INCREMENTAL lets api.runs give pages freed by dropped runs back in small steps
+SQLITE_AUTO_VACUUM = os.getenv("SQLITE_AUTO_VACUUM", "INCREMENTAL")
+_AUTO_VACUUM = {"NONE": 0, "FULL": 1, "INCREMENTAL": 2}
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+SQLITE_READ_POOL = int(os.getenv("SQLITE_READ_POOL", "8"))  # read-only connections
+SQLITE_WRITE_WAIT = float(os.getenv("SQLITE_WRITE_WAIT", "60"))  # s to wait for the writer connection
+
+_URL = f"sqlite:///{DB_PATH}"
+
+class _WriterPool(QueuePool):
+    """QueuePool that counts the threads waiting for a connection (see writer_waiting())."""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self):
+        with self._waiting_lock:
+            self.waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            with self._waiting_lock:
+                self.waiting -= 1
+
+# Writer: a single connection, so imports, mark-read and background indexing queue
+# for it in the pool instead of failing on SQLite's write lock
 engine = create_engine(
-    f"sqlite:///{DB_PATH}", echo=False, future=True,
-    connect_args={"check_same_thread": False}
+    _URL, echo=False, future=True,
+    connect_args={"check_same_thread": False},
+    poolclass=_WriterPool, pool_size=1, max_overflow=0, pool_timeout=SQLITE_WRITE_WAIT,
+)
+# Readers for the list/search/detail routes; query_only rejects any write
+read_engine = create_engine(
+    _URL, echo=False, future=True,
+    connect_args={"check_same_thread": False},
+    pool_size=SQLITE_READ_POOL, max_overflow=0,
 )
-# Session factory
+
+def _configure(dbapi_conn, read_only: bool):
+    """Pragmas and SQL functions for a new connection."""
+    cur = dbapi_conn.cursor()
+    if not read_only:
+        # auto_vacuum first: it only applies to a new file before anything (WAL included) is written
+        cur.execute(f"PRAGMA auto_vacuum = {SQLITE_AUTO_VACUUM}")
+        cur.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")  # persistent; set by the writer
+    cur.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cur.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+    cur.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    cur.execute(f"PRAGMA temp_store = {SQLITE_TEMP_STORE}")
+    cur.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+    if read_only:
+        cur.execute("PRAGMA query_only = ON")
+    cur.close()
+    # deflate()/inflate() for the compressed payload column (triggers, views, exports)
+    dbapi_conn.create_function("deflate", 1, pack, deterministic=True)
+    dbapi_conn.create_function("inflate", 1, unpack, deterministic=True)
+
+@event.listens_for(engine, "connect")
+def _configure_writer(dbapi_conn, _record):
+    _configure(dbapi_conn, read_only=False)
+
+@event.listens_for(read_engine, "connect")
+def _configure_reader(dbapi_conn, _record):
+    _configure(dbapi_conn, read_only=True)
+
+def writer_waiting() -> int:
+    """Threads queued for the writer connection right now."""
+    return engine.pool.waiting
+
+def yield_writer(limit: float = 1.0) -> None:
+    """
+    After releasing the writer, wait (up to `limit` s) until the threads queued for it have
+    taken it, so a long import that commits for them does not grab it straight back.
+    """
+    deadline = time.monotonic() + limit
+    while engine.pool.waiting and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+# Session factories
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+ReadSession = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, future=True)
 
 class Base(DeclarativeBase):
     """Base class for SQLAlchemy ORM models."""
     pass
 
+def _add_missing_columns(conn):
+    """ALTER TABLE ADD COLUMN for model columns an older database lacks."""
+    for table in Base.metadata.sorted_tables:
+        have = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+        for col in table.columns:
+            if col.name not in have:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(engine.dialect)}"
+                )
+
+def _backfill_ts_us(conn):
+    """Parse logs.ts into logs.ts_us for rows imported before the column existed."""
+    if conn.exec_driver_sql("SELECT 1 FROM logs WHERE ts_us IS NULL LIMIT 1").scalar() is None:
+        return
+    from parser.timestamps import to_epoch_us, now_epoch_us
+    now_us = now_epoch_us()
+
+    def parse(ts):
+        us = to_epoch_us(ts)
+        return now_us if us is None else us  # same fallback as imports
+
+    conn.connection.driver_connection.create_function("to_epoch_us", 1, parse, deterministic=True)
+    conn.exec_driver_sql("UPDATE logs SET ts_us = to_epoch_us(ts) WHERE ts_us IS NULL")
+
+def _split_payloads(conn) -> bool:
+    """Move logs.raw_json of an older database into compressed `payloads` rows. True if it did."""
+    have = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(logs)")}
+    if "raw_json" not in have:
+        return False
+    for name in ("logs_ai", "logs_ad", "logs_au"):  # old triggers read logs.raw_json
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    conn.exec_driver_sql("""
+        INSERT INTO payloads(log_id, raw_z)
+        SELECT id, deflate(raw_json) FROM logs WHERE id NOT IN (SELECT log_id FROM payloads)
+    """)
+    conn.exec_driver_sql("ALTER TABLE logs DROP COLUMN raw_json")
+    return True
+
+def _autoincrement_logs(conn, table) -> bool:
+    """Rebuild an older `logs` table as AUTOINCREMENT (see models.Log). True if it did."""
+    from sqlalchemy.schema import CreateTable
+    sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'logs'").scalar()
+    if "AUTOINCREMENT" in sql.upper():
+        return False
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    cols = ", ".join(c.name for c in table.columns)
+    conn.exec_driver_sql(ddl.replace("CREATE TABLE logs ", "CREATE TABLE logs_new ", 1))
+    # Explicit ids also start sqlite_sequence at the current maximum
+    conn.exec_driver_sql(f"INSERT INTO logs_new ({cols}) SELECT {cols} FROM logs")
+    # Its triggers and indexes go with it and are recreated by init_db; legacy rename keeps
+    # SQLite from re-checking logs_text and the payloads triggers while `logs` is missing
+    conn.exec_driver_sql("DROP TABLE logs")
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    conn.exec_driver_sql("ALTER TABLE logs_new RENAME TO logs")
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+    return True
+
 def init_db():
     """Create tables and FTS5 virtual table + triggers for full-text search."""
-    from .models import Log, Body
+    from .models import Log, Body, BodyBlob, Payload
+    from . import body_store, fields, fts, runs, timeline, cache
+    with engine.connect() as conn:
+        # A database created before auto_vacuum was configured switches with the VACUUM below
+        convert = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != _AUTO_VACUUM[SQLITE_AUTO_VACUUM.upper()]
     Base.metadata.create_all(bind=engine)
-    # Create FTS5 virtual table (summary + raw_json) and keep it in sync via triggers
+    # create_all skips existing tables; add columns and indexes introduced later
+    with engine.begin() as conn:
+        _add_missing_columns(conn)
+        _backfill_ts_us(conn)
+        dropped = _split_payloads(conn)
+        dropped = body_store.migrate(conn) or dropped
+        dropped = _autoincrement_logs(conn, Log.__table__) or dropped
+        # Superseded by the *_ts_us indexes: ts is display-only, and level / tf_req_id
+        # alone are the leading column of ix_logs_level_ts_us / ix_logs_tf_req_id_ts_us
+        for name in ("ix_logs_level_ts", "ix_logs_tf_req_id_ts", "ix_logs_ts", "ix_logs_level", "ix_logs_tf_req_id"):
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    if dropped or convert:
+        # Give the pages freed by the dropped columns back to the filesystem (or switch auto_vacuum)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+    # FTS5 virtual table (summary + raw_json), kept in sync via triggers
+    with engine.begin() as conn:
+        fts.install(conn)
+        body_store.install(conn)
+    # Per-tf_req_id summary for /timeline
+    with engine.begin() as conn:
+        timeline.install(conn)
+        cache.install(conn)
+    # Extracted tflog attributes; backfills names added to EXTRACT_FIELDS
     with engine.begin() as conn:
-        conn.exec_driver_sql("""
-        CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
-            log_id UNINDEXED,
-            summary,
-            raw_json
-        );
-        """)
-        # Insert trigger
-        conn.exec_driver_sql("""
-        CREATE TRIGGER IF NOT EXISTS logs_ai AFTER INSERT ON logs BEGIN
-          INSERT INTO logs_fts(rowid, log_id, summary, raw_json)
-          VALUES (new.id, new.id, new.summary, new.raw_json);
-        END;
-        """)
-        # Delete trigger
-        conn.exec_driver_sql("""
-        CREATE TRIGGER IF NOT EXISTS logs_ad AFTER DELETE ON logs BEGIN
-          DELETE FROM logs_fts WHERE rowid = old.id;
-        END;
-        """)
-        # Update trigger
-        conn.exec_driver_sql("""
-        CREATE TRIGGER IF NOT EXISTS logs_au AFTER UPDATE ON logs BEGIN
-          UPDATE logs_fts SET summary = new.summary, raw_json = new.raw_json
-           WHERE rowid = new.id;
-        END;
-        """)
\ No newline at end of file
+        fields.install(conn)
+        runs.install(conn)
@@ -2,18 +2,27 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyHeader
 from sqlalchemy.orm import Session
 import os
-from .db import SessionLocal
+from .db import SessionLocal, ReadSession
 
 _API_KEY_NAME = "X-API-Key"
 _api_key_header = APIKeyHeader(name=_API_KEY_NAME, auto_error=False)
 
 def get_db() -> Session:
+    """Session on the single writer connection (imports, mark-read, demo seed)."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def get_read_db() -> Session:
+    """Session on the read-only pool; never waits behind an import."""
+    db = ReadSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def require_api_key(x_api_key: str | None = Depends(_api_key_header)):
     expected = os.getenv("API_KEY", "dev-key-123")
     if not x_api_key or x_api_key != expected:
@@ -0,0 +1,161 @@
+# Structured tflog attributes extracted at import (table `log_fields`).
+# - EXTRACT_FIELDS names top-level record keys (tf_provider_addr, tf_rpc, @module, ...);
+#   each distinct string value is stored once in `field_values`, and `log_fields`
+#   holds (value_id, log_id) pairs, so a row costs a few bytes per attribute.
+# - /search filters on them with exact / IN matches and lists distinct values with
+#   counts, both as range scans of the (value_id, log_id) key instead of FTS over raw_json.
+# - The configured list is remembered in `field_state`; when it changes, install()
+#   drops removed names and extracts added ones from the stored payloads.
+# - `python -m api.fields check|rebuild` verifies or repairs the table.
+
+import argparse
+import json
+import os
+from typing import Iterator
+from sqlalchemy.engine import Connection
+from .compression import unpack
+from .db import engine
+
+EXTRACT_FIELDS = os.getenv("EXTRACT_FIELDS", "tf_provider_addr,tf_resource_type,tf_rpc,@module,@caller")
+FIELDS = tuple(dict.fromkeys(f.strip() for f in EXTRACT_FIELDS.split(",") if f.strip()))
+
+_INSERT = "INSERT OR IGNORE INTO log_fields(value_id, log_id) VALUES (?, ?)"
+_PAIRS = "SELECT f.log_id, v.name, v.value FROM log_fields f JOIN field_values v ON v.id = f.value_id"
+
+
+def extract(rec: dict, names: tuple[str, ...] = FIELDS) -> list[tuple[str, str]]:
+    """(name, value) for each configured key holding a non-empty string."""
+    out = []
+    for name in names:
+        value = rec.get(name)
+        if isinstance(value, str) and value:
+            out.append((name, value))
+    return out
+
+
+def install(conn: Connection) -> None:
+    """Delete trigger on `logs`, and sync `log_fields` with the configured field list."""
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS logs_fields_ad")
+    conn.exec_driver_sql("""
+    CREATE TRIGGER logs_fields_ad AFTER DELETE ON logs BEGIN
+      DELETE FROM log_fields WHERE log_id = old.id;
+    END;
+    """)
+    conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS field_state (names TEXT NOT NULL)")
+    stored = conn.exec_driver_sql("SELECT names FROM field_state").scalar()
+    if stored is None:
+        conn.exec_driver_sql("INSERT INTO field_state(names) VALUES ('[]')")
+        stored = "[]"
+    old = set(json.loads(stored))
+    removed = old - set(FIELDS)
+    added = tuple(n for n in FIELDS if n not in old)
+    for name in removed:
+        conn.exec_driver_sql(
+            "DELETE FROM log_fields WHERE value_id IN (SELECT id FROM field_values WHERE name = ?)", (name,)
+        )
+        conn.exec_driver_sql("DELETE FROM field_values WHERE name = ?", (name,))
+    if added:
+        backfill(conn, added)
+    if removed or added:
+        conn.exec_driver_sql("UPDATE field_state SET names = ?", (json.dumps(FIELDS),))
+
+
+def _scan(conn: Connection, names: tuple[str, ...], chunk: int) -> Iterator[list[tuple[int, str, str]]]:
+    """(log_id, name, value) rows re-extracted from stored payloads, one list per chunk."""
+    after = -1
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT log_id, raw_z FROM payloads WHERE log_id > ? ORDER BY log_id LIMIT ?", (after, chunk)
+        ).all()
+        if not rows:
+            return
+        out = []
+        for log_id, raw_z in rows:
+            try:
+                rec = json.loads(unpack(raw_z))
+            except ValueError:
+                continue
+            if isinstance(rec, dict):
+                out += [(log_id, name, value) for name, value in extract(rec, names)]
+        yield out
+        after = rows[-1][0]
+
+
+def backfill(conn: Connection, names: tuple[str, ...] = FIELDS, chunk: int = 5000) -> int:
+    """Extract `names` from every stored payload. Returns rows written."""
+    written = 0
+    known: dict[tuple[str, str], int] = {}
+    for rows in _scan(conn, names, chunk):
+        insert(conn, rows, known)
+        written += len(rows)
+    return written
+
+
+def value_id(conn: Connection, name: str, value: str) -> int:
+    """Id of (name, value) in `field_values`, added if new."""
+    found = conn.exec_driver_sql(
+        "SELECT id FROM field_values WHERE name = ? AND value = ?", (name, value)
+    ).scalar()
+    if found is None:
+        found = conn.exec_driver_sql(
+            "INSERT INTO field_values(name, value) VALUES (?, ?)", (name, value)
+        ).lastrowid
+    return found
+
+
+def insert(conn: Connection, rows: list[tuple[int, str, str]], known: dict[tuple[str, str], int] | None = None) -> None:
+    """
+    Store (log_id, name, value) rows from an import. `known` is an optional
+    (name, value) -> id cache owned by the caller; values are only removed by rebuild().
+    """
+    if not rows:
+        return
+    known = {} if known is None else known
+    params = []
+    for log_id, name, value in rows:
+        vid = known.get((name, value))
+        if vid is None:
+            vid = known[(name, value)] = value_id(conn, name, value)
+        params.append((vid, log_id))
+    conn.exec_driver_sql(_INSERT, params)
+
+
+def rebuild(conn: Connection) -> int:
+    """Re-extract every configured field from the payloads. Returns rows written."""
+    conn.exec_driver_sql("DELETE FROM log_fields")
+    conn.exec_driver_sql("DELETE FROM field_values")
+    return backfill(conn)
+
+
+def check(conn: Connection) -> dict:
+    """Compare the table with a fresh extraction into a temp table."""
+    conn.exec_driver_sql(
+        "CREATE TEMP TABLE IF NOT EXISTS log_fields_check (log_id INTEGER, name TEXT, value TEXT)"
+    )
+    conn.exec_driver_sql("DELETE FROM log_fields_check")
+    for rows in _scan(conn, FIELDS, 5000):
+        if rows:
+            conn.exec_driver_sql("INSERT INTO log_fields_check(log_id, name, value) VALUES (?, ?, ?)", rows)
+    missing = conn.exec_driver_sql(
+        f"SELECT count(*) FROM (SELECT * FROM log_fields_check EXCEPT {_PAIRS})"
+    ).scalar()
+    extra = conn.exec_driver_sql(
+        f"SELECT count(*) FROM ({_PAIRS} EXCEPT SELECT * FROM log_fields_check)"
+    ).scalar()
+    conn.exec_driver_sql("DROP TABLE log_fields_check")
+    return {"fields": list(FIELDS), "missing": missing, "extra": extra, "ok": missing == 0 and extra == 0}
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m api.fields", description="Check or repair log_fields.")
+    ap.add_argument("command", choices=["check", "rebuild"])
+    args = ap.parse_args(argv)
+    from .db import init_db
+    init_db()
+    with engine.begin() as conn:
+        out = check(conn) if args.command == "check" else {"rebuilt": rebuild(conn)}
+    print(json.dumps(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from fastapi import HTTPException, Query
+from sqlalchemy import select, text
+from parser.timestamps import to_epoch_us
+from . import runs
+from .fields import FIELDS
+from .fts_query import matches, to_match
+from .models import Log, LogField, FieldValue, SearchFilter
+
+
+def ts_bound(value: str, name: str) -> int:
+    """Query timestamp (ISO8601 with any offset, or epoch number) -> epoch microseconds."""
+    us = to_epoch_us(value)
+    if us is None:
+        raise HTTPException(400, f"Invalid {name}")
+    return us
+
+
+def match_expr(q: str) -> str:
+    """Search box text -> FTS5 expression; 400 when nothing searchable is left."""
+    try:
+        return to_match(q)
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid q: {e}")
+
+
+def text_condition(expr: str, plan: str = "match"):
+    """
+    WHERE clause for an FTS5 expression on `logs`. "match" collects the matching ids
+    first; "scan" probes the index for each candidate row (see api.fts_query.plan).
+    """
+    if plan == "scan":
+        return text("EXISTS (SELECT 1 FROM logs_fts WHERE logs_fts MATCH :fts_q AND logs_fts.rowid = logs.id)") \
+            .bindparams(fts_q=expr)
+    return Log.id.in_(matches(expr))
+
+
+def field_filters(field: list[str] | None) -> dict[str, list[str]]:
+    """`name:value` filters -> {name: values}; a repeated name matches any of its values."""
+    out: dict[str, list[str]] = {}
+    for spec in field or ():
+        name, sep, value = spec.partition(":")
+        if not sep or name not in FIELDS:
+            raise HTTPException(400, f"Invalid field filter: {spec} (fields: {', '.join(FIELDS)})")
+        out.setdefault(name, []).append(value)
+    return out
+
+
+def search_filter(
+    q: str | None = Query(None, description="full-text over summary/raw_json"),
+    level: str | None = None,
+    tf_req_id: str | None = None,
+    from_ts: str | None = None,
+    to_ts: str | None = None,
+    field: list[str] = Query([], description="name:value on an extracted attribute (e.g. tf_rpc:ApplyResourceChange); repeat a name for any-of"),
+    run: int | None = Query(None, description="only rows of this import run (see /runs)"),
+) -> SearchFilter:
+    """The /search filter query parameters, for every route that takes them; feed to log_conditions / filter_key."""
+    return SearchFilter(q=q, level=level, tf_req_id=tf_req_id, from_ts=from_ts, to_ts=to_ts, field=field, run=run)
+
+
+def filter_key(
+    q: str | None = None,
+    level: str | None = None,
+    tf_req_id: str | None = None,
+    from_ts: str | None = None,
+    to_ts: str | None = None,
+    field: list[str] | None = None,
+    run: int | None = None,
+) -> tuple:
+    """Normalized form of a filter for cache keys: blanks dropped, bounds as epoch microseconds."""
+    return (
+        q.strip() if q and q.strip() else None,
+        level or None,
+        tf_req_id or None,
+        ts_bound(from_ts, "from_ts") if from_ts else None,
+        ts_bound(to_ts, "to_ts") if to_ts else None,
+        tuple(sorted((name, tuple(sorted(set(values)))) for name, values in field_filters(field).items())),
+        run,
+    )
+
+
+def log_conditions(
+    q: str | None = None,
+    level: str | None = None,
+    tf_req_id: str | None = None,
+    from_ts: str | None = None,
+    to_ts: str | None = None,
+    field: list[str] | None = None,
+    run: int | None = None,
+) -> list:
+    """WHERE clauses shared by /search and the bulk endpoints (no joins, so usable in UPDATE)."""
+    conds = []
+    if level: conds.append(Log.level == level)
+    if tf_req_id: conds.append(Log.tf_req_id == tf_req_id)
+    if from_ts: conds.append(Log.ts_us >= ts_bound(from_ts, "from_ts"))
+    if to_ts: conds.append(Log.ts_us <= ts_bound(to_ts, "to_ts"))
+    if run is not None: conds.append(runs.condition(run))
+    # Extracted attributes: value ids from field_values, then log ids by (value_id, log_id) range
+    for name, values in field_filters(field).items():
+        match = FieldValue.value == values[0] if len(values) == 1 else FieldValue.value.in_(values)
+        ids = select(FieldValue.id).where(FieldValue.name == name, match)
+        conds.append(Log.id.in_(select(LogField.log_id).where(LogField.value_id.in_(ids))))
+    # Full-text search (if q is provided)
+    if q and q.strip():
+        conds.append(text_condition(match_expr(q)))
+    return conds
@@ -0,0 +1,265 @@
+# FTS5 index over logs.summary and the payload JSON (payloads.raw_z, inflated).
+# - "inline" layout (default) stores its own copy of the text; "external" uses
+#   content='logs_text', a view joining logs with the decompressed payload.
+# - Per-row triggers keep the index in sync for ordinary writes; a row is indexed
+#   when its payload is inserted. Bulk imports can pause that trigger for their
+#   own transaction and queue the inserted id range in `fts_pending`;
+#   index_pending() then indexes each range in one pass.
+# - `python -m api.fts check|index|rebuild` verifies or repairs the index.
+
+import argparse
+import asyncio
+import json
+import os
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError, TimeoutError
+from .db import engine
+
+FTS_CONTENT = os.getenv("FTS_CONTENT", "inline")  # inline | external
+FTS_INDEX_INTERVAL = float(os.getenv("FTS_INDEX_INTERVAL", "5"))  # seconds; 0 disables the background indexer
+
+_TRIGGERS = ("logs_ai", "logs_ad", "logs_au", "payloads_ai", "payloads_au")
+# Only touch the index for rows it actually holds (pending rows are not indexed yet)
+_INDEXED = "EXISTS (SELECT 1 FROM logs_fts_docsize WHERE id = {id})"
+# Default `rank` (ORDER BY rank): BM25 with summary hits weighted above raw_json hits
+_RANK = {False: "bm25(0.0, 2.0, 1.0)", True: "bm25(2.0, 1.0)"}  # by external layout; log_id is unindexed
+_TEXT_VIEW = """
+CREATE VIEW IF NOT EXISTS logs_text AS
+SELECT l.id AS id, l.summary AS summary, inflate(p.raw_z) AS raw_json
+  FROM logs l JOIN payloads p ON p.log_id = l.id
+"""
+
+
+def _content(conn: Connection) -> str | None:
+    """content= table of logs_fts, None for the inline layout."""
+    sql = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'logs_fts'"
+    ).scalar() or ""
+    sql = sql.replace(" ", "")
+    if "content=" not in sql:
+        return None
+    return sql.split("content=", 1)[1].split(",", 1)[0].strip("'\"")
+
+
+def _is_external(conn: Connection) -> bool:
+    return _content(conn) is not None
+
+
+def _fts_insert(external: bool) -> str:
+    """INSERT ... SELECT prefix copying logs + payload text into the index (filter on `id`)."""
+    if external:
+        return "INSERT INTO logs_fts(rowid, summary, raw_json) SELECT id, summary, raw_json FROM logs_text"
+    return ("INSERT INTO logs_fts(rowid, log_id, summary, raw_json) "
+            "SELECT id, id, summary, raw_json FROM logs_text")
+
+
+def _create_table(conn: Connection, external: bool) -> None:
+    if external:
+        conn.exec_driver_sql("""
+        CREATE VIRTUAL TABLE logs_fts USING fts5(
+            summary,
+            raw_json,
+            content='logs_text',
+            content_rowid='id'
+        );
+        """)
+    else:
+        conn.exec_driver_sql("""
+        CREATE VIRTUAL TABLE logs_fts USING fts5(
+            log_id UNINDEXED,
+            summary,
+            raw_json
+        );
+        """)
+
+
+def _create_triggers(conn: Connection, external: bool) -> None:
+    for name in _TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    if external:
+        add = ("INSERT INTO logs_fts(rowid, summary, raw_json) "
+               "SELECT new.log_id, summary, inflate(new.raw_z) FROM logs WHERE id = new.log_id;")
+
+        def replace(row_id, old_summary, old_raw, new_summary, new_raw):
+            return (f"INSERT INTO logs_fts(logs_fts, rowid, summary, raw_json) "
+                    f"VALUES ('delete', {row_id}, {old_summary}, {old_raw});\n"
+                    f"INSERT INTO logs_fts(rowid, summary, raw_json) VALUES ({row_id}, {new_summary}, {new_raw});")
+        remove = ("INSERT INTO logs_fts(logs_fts, rowid, summary, raw_json) "
+                  "SELECT 'delete', old.id, old.summary, inflate(raw_z) FROM payloads "
+                  f"WHERE log_id = old.id AND {_INDEXED.format(id='old.id')};")
+        raw = "(SELECT inflate(raw_z) FROM payloads WHERE log_id = new.id)"
+        update_summary = replace("new.id", "old.summary", raw, "new.summary", raw)
+        summary = "(SELECT summary FROM logs WHERE id = new.log_id)"
+        update_raw = replace("new.log_id", summary, "inflate(old.raw_z)", summary, "inflate(new.raw_z)")
+    else:
+        add = ("INSERT INTO logs_fts(rowid, log_id, summary, raw_json) "
+               "SELECT new.log_id, new.log_id, summary, inflate(new.raw_z) FROM logs WHERE id = new.log_id;")
+        remove = "DELETE FROM logs_fts WHERE rowid = old.id;"
+        update_summary = "UPDATE logs_fts SET summary = new.summary WHERE rowid = new.id;"
+        update_raw = "UPDATE logs_fts SET raw_json = inflate(new.raw_z) WHERE rowid = new.log_id;"
+    # Index a row once its payload exists (skipped while a bulk import has paused indexing)
+    conn.exec_driver_sql(f"""
+    CREATE TRIGGER payloads_ai AFTER INSERT ON payloads
+    WHEN (SELECT paused FROM fts_state) = 0 BEGIN
+      {add}
+    END;
+    """)
+    # Delete trigger; also drops the payload
+    conn.exec_driver_sql(f"""
+    CREATE TRIGGER logs_ad AFTER DELETE ON logs BEGIN
+      {remove}
+      DELETE FROM payloads WHERE log_id = old.id;
+    END;
+    """)
+    # Update triggers; only indexed columns, so read-state flips never touch the index
+    conn.exec_driver_sql(f"""
+    CREATE TRIGGER logs_au AFTER UPDATE OF summary ON logs
+    WHEN {_INDEXED.format(id="new.id")} BEGIN
+      {update_summary}
+    END;
+    """)
+    conn.exec_driver_sql(f"""
+    CREATE TRIGGER payloads_au AFTER UPDATE OF raw_z ON payloads
+    WHEN {_INDEXED.format(id="new.log_id")} BEGIN
+      {update_raw}
+    END;
+    """)
+
+
+def install(conn: Connection) -> None:
+    """Create FTS table, bookkeeping tables and triggers; migrate layout if FTS_CONTENT changed."""
+    conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS fts_state (paused INTEGER NOT NULL)")
+    if conn.exec_driver_sql("SELECT count(*) FROM fts_state").scalar() == 0:
+        conn.exec_driver_sql("INSERT INTO fts_state(paused) VALUES (0)")
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS fts_pending (lo INTEGER NOT NULL, hi INTEGER NOT NULL)"
+    )
+    conn.exec_driver_sql(_TEXT_VIEW)
+    external = FTS_CONTENT == "external"
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_fts'"
+    ).scalar()
+    if exists and _content(conn) != ("logs_text" if external else None):
+        # Layout switch (or an external index still reading logs.raw_json): recreate and re-index
+        for name in _TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql("DROP TABLE logs_fts")
+        exists = False
+    if not exists:
+        _create_table(conn, external)
+        _create_triggers(conn, external)
+        rebuild(conn)
+    else:
+        _create_triggers(conn, external)
+    rank = conn.exec_driver_sql("SELECT v FROM logs_fts_config WHERE k = 'rank'").scalar()
+    if rank != _RANK[external]:
+        conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts, rank) VALUES ('rank', ?)", (_RANK[external],))
+
+
+def pause(conn: Connection) -> int:
+    """
+    Stop the insert trigger for the current transaction and return the last log id.
+    Must be paired with resume() before commit; a rollback undoes it on its own.
+    """
+    conn.exec_driver_sql("UPDATE fts_state SET paused = 1")
+    return conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM logs").scalar()
+
+
+def resume(conn: Connection, after_id: int) -> None:
+    """Queue ids inserted since pause() for indexing and re-enable the trigger."""
+    hi = conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM logs").scalar()
+    if hi > after_id:
+        conn.exec_driver_sql("INSERT INTO fts_pending(lo, hi) VALUES (?, ?)", (after_id + 1, hi))
+    conn.exec_driver_sql("UPDATE fts_state SET paused = 0")
+
+
+def index_pending(conn: Connection) -> int:
+    """Index every queued id range in one INSERT ... SELECT each. Returns rows indexed."""
+    ranges = conn.exec_driver_sql("SELECT rowid, lo, hi FROM fts_pending ORDER BY lo").all()
+    if not ranges:
+        return 0
+    prefix = _fts_insert(_is_external(conn))
+    total = 0
+    for rid, lo, hi in ranges:
+        total += conn.exec_driver_sql(f"{prefix} WHERE id BETWEEN ? AND ?", (lo, hi)).rowcount
+        conn.exec_driver_sql("DELETE FROM fts_pending WHERE rowid = ?", (rid,))
+    return total
+
+
+def rebuild(conn: Connection) -> int:
+    """Drop the index contents and re-index every row of `logs`."""
+    conn.exec_driver_sql("DELETE FROM fts_pending")
+    if _is_external(conn):
+        conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')")
+    else:
+        conn.exec_driver_sql("DELETE FROM logs_fts")
+        conn.exec_driver_sql(_fts_insert(False))
+    return conn.exec_driver_sql("SELECT count(*) FROM logs_fts_docsize").scalar()
+
+
+def check(conn: Connection) -> dict:
+    """Compare the index against `logs`; `ok` is False when a rebuild is needed."""
+    pending = conn.exec_driver_sql(
+        "SELECT COALESCE(SUM(hi - lo + 1), 0) FROM fts_pending"
+    ).scalar()
+    missing = conn.exec_driver_sql("""
+        SELECT count(*) FROM logs
+         WHERE id NOT IN (SELECT id FROM logs_fts_docsize)
+           AND NOT EXISTS (SELECT 1 FROM fts_pending p WHERE logs.id BETWEEN p.lo AND p.hi)
+    """).scalar()
+    orphans = conn.exec_driver_sql(
+        "SELECT count(*) FROM logs_fts_docsize WHERE id NOT IN (SELECT id FROM logs)"
+    ).scalar()
+    try:
+        # rank=1 also compares an external-content index with its content table,
+        # which only holds once nothing is pending
+        conn.exec_driver_sql(
+            "INSERT INTO logs_fts(logs_fts, rank) VALUES ('integrity-check', ?)", (int(pending == 0),)
+        )
+        integrity = "ok"
+    except OperationalError as e:
+        integrity = str(e.orig)
+    return {
+        "layout": "external" if _is_external(conn) else "inline",
+        "logs": conn.exec_driver_sql("SELECT count(*) FROM logs").scalar(),
+        "indexed": conn.exec_driver_sql("SELECT count(*) FROM logs_fts_docsize").scalar(),
+        "pending": pending,
+        "missing": missing,
+        "orphans": orphans,
+        "integrity": integrity,
+        "ok": missing == 0 and orphans == 0 and integrity == "ok",
+    }
+
+
+async def background_indexer(interval: float = FTS_INDEX_INTERVAL) -> None:
+    """Periodically index ranges left by imports that deferred indexing."""
+    def _run():
+        with engine.begin() as conn:
+            return index_pending(conn)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_run)
+        except (OperationalError, TimeoutError):
+            continue  # an import holds the writer; retry on the next tick
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m api.fts", description="Check or repair the logs_fts index.")
+    ap.add_argument("command", choices=["check", "index", "rebuild"])
+    args = ap.parse_args(argv)
+    from .db import init_db
+    init_db()
+    with engine.begin() as conn:
+        if args.command == "check":
+            out = check(conn)
+        elif args.command == "index":
+            out = {"indexed": index_pending(conn)}
+        else:
+            out = {"indexed": rebuild(conn)}
+    print(json.dumps(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Full-text query handling for /search on top of logs_fts (api.fts).
+# - to_match() turns user input into an FTS5 expression that cannot be a syntax
+#   error: words, "phrases", prefix*, -exclusions and OR, every term quoted.
+# - plan() picks how a paged search evaluates the match:
+#   "match": collect all matching rowids, then filter and sort them (cost ~ matches);
+#   "scan":  walk the filtered rows in page order and probe the index per row,
+#            stopping at the page size (cost ~ page size / match rate).
+#   It counts matches up to the break-even point instead of computing them all,
+#   and samples how many survive the other filters. Prefix terms always use "match":
+#   every probe would re-merge the doclists of all the terms the prefix expands to.
+# - snippets() highlights the terms of one page with snippet(), HTML-escaped.
+
+import html
+import math
+import os
+import re
+from sqlalchemy import Float, Integer, and_, column, func, select, table, text
+from sqlalchemy.engine import Connection
+from .models import Log
+
+# Per-row index probe vs per-match cost of collecting rowids, measured on the synthetic corpus
+FTS_SCAN_COST_RATIO = float(os.getenv("FTS_SCAN_COST_RATIO", "130"))
+_SAMPLE = 1000
+
+_TOKEN = re.compile(r'-?"[^"]*"?|\S+')
+_WORD = re.compile(r"[^\W_]+")  # the characters unicode61 keeps in tokens
+
+_MARK_START, _MARK_END = "\x01", "\x02"
+
+# logs_fts as a selectable, for joins ordered by `rank` (see api.fts for its BM25 weights)
+fts_table = table("logs_fts", column("rowid", Integer), column("rank", Float))
+
+
+def to_match(q: str) -> str:
+    """
+    Safe FTS5 expression for a search box string. Raises ValueError when nothing
+    searchable is left (e.g. only punctuation, or only exclusions).
+    """
+    groups: list[tuple[list[str], list[str]]] = [([], [])]
+    for tok in _TOKEN.findall(q):
+        if tok == "OR":
+            groups.append(([], []))
+            continue
+        negate = len(tok) > 1 and tok.startswith("-")
+        if negate:
+            tok = tok[1:]
+        prefix = not tok.startswith('"') and tok.endswith("*")
+        words = _WORD.findall(tok)
+        if not words:
+            continue
+        phrase = '"' + " ".join(words) + '"' + ("*" if prefix else "")
+        groups[-1][1 if negate else 0].append(phrase)
+    parts = []
+    for include, exclude in groups:
+        if not include:
+            if exclude:
+                raise ValueError("Exclusions need a term to match")
+            continue
+        parts.append(" AND ".join(include) + "".join(f" NOT {e}" for e in exclude))
+    if not parts:
+        raise ValueError("No searchable terms")
+    return parts[0] if len(parts) == 1 else " OR ".join(f"({p})" for p in parts)
+
+
+def match_clause(expr: str):
+    """`logs_fts MATCH expr` for an expression from to_match()."""
+    return text("logs_fts MATCH :fts_q").bindparams(fts_q=expr)
+
+
+def matches(expr: str):
+    """SELECT rowid FROM logs_fts for an expression from to_match()."""
+    return select(fts_table.c.rowid).where(match_clause(expr))
+
+
+def plan(conn: Connection, expr: str, conds: list, rows: int) -> str:
+    """Return "scan" or "match" for fetching the first `rows` rows in page order under `conds`."""
+    if '"*' in expr:
+        return "match"
+    sample = [r for r, in conn.execute(
+        text("SELECT rowid FROM logs_fts WHERE logs_fts MATCH :q LIMIT :n"), {"q": expr, "n": _SAMPLE}
+    )]
+    if len(sample) < _SAMPLE:
+        return "match"
+    kept = _SAMPLE
+    if conds:
+        kept = conn.execute(select(func.count()).where(Log.id.in_(sample), and_(*conds))).scalar()
+        if not kept:
+            return "match"  # the filters and the terms rarely meet: walking the filters would not stop early
+    total = conn.execute(select(func.max(Log.id))).scalar() or 0
+    # scan ~ ratio * rows * total / matches, match ~ matches * kept fraction
+    need = math.sqrt(FTS_SCAN_COST_RATIO * rows * total * _SAMPLE / kept)
+    if need >= total:
+        return "match"
+    found = conn.execute(
+        text("SELECT count(*) FROM (SELECT rowid FROM logs_fts WHERE logs_fts MATCH :q LIMIT :n)"),
+        {"q": expr, "n": int(need)},
+    ).scalar()
+    return "scan" if found >= int(need) else "match"
+
+
+def snippets(conn: Connection, expr: str, ids: list[int], tokens: int = 16) -> dict[int, str]:
+    """id -> best-column excerpt with matched terms in <mark>, everything else HTML-escaped."""
+    if not ids:
+        return {}
+    marks = ",".join("?" * len(ids))
+    rows = conn.exec_driver_sql(
+        f"SELECT rowid, snippet(logs_fts, -1, ?, ?, '…', ?) FROM logs_fts "
+        f"WHERE logs_fts MATCH ? AND rowid IN ({marks})",
+        (_MARK_START, _MARK_END, tokens, expr, *ids),
+    ).all()
+    return {
+        row_id: html.escape(s).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+        for row_id, s in rows
+    }
@@ -0,0 +1,78 @@
+# Conditional GET and serialized-response caching for the read API.
+# - ETag is the data generation plus the time it last changed, so it moves on every
+#   import, demo seed and read-state change, and a fresh database never reuses one.
+# - A matching If-None-Match (or If-Modified-Since) is answered with 304 before the
+#   route's query runs; otherwise the JSON body comes from `cache.responses`, keyed on
+#   (generation, path, sorted query), and is only built (query + pydantic) on a miss.
+# - Routes keep their auth dependency, so 304s and cache hits are never served to a
+#   caller without a valid API key.
+
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from parser.timestamps import now_epoch_us
+from . import cache
+
+_S = 1_000_000
+_ANY = TypeAdapter(Any)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match."""
+    if header.strip() == "*":
+        return True
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags
+
+
+def _since(header: str) -> int | None:
+    try:
+        return int(parsedate_to_datetime(header).timestamp()) * _S
+    except (TypeError, ValueError):
+        return None
+
+
+def _headers(gen: int, changed_us: int) -> dict:
+    headers = {"ETag": f'"{gen}-{changed_us:x}"', "Cache-Control": "private, no-cache"}
+    # HTTP dates have whole seconds: advertise the end of the second of the last change,
+    # and only once that second is over, so a later write can never share the same date
+    last = changed_us // _S + 1
+    if now_epoch_us() >= last * _S:
+        headers["Last-Modified"] = formatdate(last, usegmt=True)
+    return headers
+
+
+def _not_modified(request: Request, etag: str, changed_us: int) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _etag_matches(inm, etag)  # takes precedence over If-Modified-Since
+    ims = request.headers.get("if-modified-since")
+    if ims is not None:
+        since = _since(ims)
+        return since is not None and changed_us < since
+    return False
+
+
+def cached_json(request: Request, db: Session, compute: Callable[[], Any],
+                adapter: TypeAdapter | None = None) -> Response:
+    """
+    JSON response for a read route, validated/serialized through `adapter` (the route's
+    response model; plain JSON types without one). 304 when the client copy is current.
+    """
+    # Read before the query: a body can only be newer than the generation it is cached under
+    gen, changed_us = cache.state(db.connection())
+    headers = _headers(gen, changed_us)
+    if _not_modified(request, headers["ETag"], changed_us):
+        return Response(status_code=304, headers=headers)
+    key = (gen, request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+    def render() -> bytes:
+        value = compute()
+        if adapter is None:
+            return _ANY.dump_json(value)
+        return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+    body = cache.responses.get_or_compute(key, render)
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,146 @@
+# In-process import jobs.
+# - POST /import/jobs spools the upload to a temp file and returns a job id at once;
+#   ingestion runs as an asyncio task with its own session.
+# - One import (job or synchronous /import) writes at a time per process; the rest
+#   wait as "queued" instead of fighting over the SQLite lock.
+# - Cancelling a running job rolls back only the chunk not yet committed.
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from fastapi import UploadFile
+from parser.main import ImportProgress, import_file_like
+from .db import SessionLocal
+
+# Clamped to 1: there is a single writer connection (api.db), so a second concurrent
+# import would only queue for it and end in a pool timeout
+IMPORT_CONCURRENCY = min(1, int(os.getenv("IMPORT_CONCURRENCY", "1")))
+JOBS_KEEP = 100  # finished jobs kept for status queries
+
+_slots: asyncio.Semaphore | None = None
+_jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+
+
+@dataclass
+class ImportJob:
+    id: str
+    filename: str
+    bytes_total: int
+    status: str = "queued"  # queued | running | done | failed | cancelled
+    progress: ImportProgress = field(default_factory=ImportProgress)
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    imported: int | None = None
+    error: str | None = None
+    task: asyncio.Task | None = None
+
+    def to_dict(self) -> dict:
+        """Status snapshot with throughput and ETA derived from progress so far."""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        bytes_read, records = self.progress.bytes_read, self.progress.records
+        bytes_rate = bytes_read / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and bytes_rate > 0:
+            eta = round(max(self.bytes_total - bytes_read, 0) / bytes_rate, 1)
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "bytes_total": self.bytes_total,
+            "bytes_read": bytes_read,
+            "records": records,
+            "imported": self.imported,
+            "run_id": self.progress.run_id,
+            "elapsed": round(elapsed, 3),
+            "records_per_s": round(records / elapsed, 1) if elapsed > 0 else 0.0,
+            "bytes_per_s": round(bytes_rate, 1),
+            "eta_s": eta,
+            "error": self.error,
+        }
+
+
+@asynccontextmanager
+async def import_slot():
+    """Hold one of the per-process import slots."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(max(1, IMPORT_CONCURRENCY))
+    async with _slots:
+        yield
+
+
+def _spool(src, dst_path: str) -> int:
+    with open(dst_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+        return dst.tell()
+
+
+async def _run(job: ImportJob, path: str, options: dict) -> None:
+    async with import_slot():
+        job.status = "running"
+        job.started_at = time.time()
+        db = SessionLocal()
+        try:
+            with open(path, "rb") as f:
+                # UploadFile reads regular files in a worker thread
+                job.imported = await import_file_like(
+                    UploadFile(f, filename=job.filename), db, progress=job.progress, **options
+                )
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            db.close()
+
+
+def _finished(job: ImportJob, path: str, task: asyncio.Task) -> None:
+    # Also runs for tasks cancelled before their first step
+    if task.cancelled():
+        job.status = "cancelled"
+    job.finished_at = time.time()
+    os.remove(path)
+
+
+def _evict() -> None:
+    finished = [j.id for j in _jobs.values() if j.finished_at is not None]
+    for job_id in finished[: max(0, len(finished) - JOBS_KEEP)]:
+        del _jobs[job_id]
+
+
+async def submit(upload: UploadFile, options: dict) -> ImportJob:
+    """Copy the upload aside (it is closed with the request) and start a job for it."""
+    fd, path = tempfile.mkstemp(prefix="import-", suffix=".part")
+    os.close(fd)
+    await upload.seek(0)
+    size = await asyncio.to_thread(_spool, upload.file, path)
+    job = ImportJob(id=uuid.uuid4().hex, filename=upload.filename or "", bytes_total=size)
+    _jobs[job.id] = job
+    _evict()
+    job.task = asyncio.create_task(_run(job, path, options))
+    job.task.add_done_callback(lambda task: _finished(job, path, task))
+    return job
+
+
+def get(job_id: str) -> ImportJob | None:
+    return _jobs.get(job_id)
+
+
+def all_jobs() -> list[ImportJob]:
+    return list(_jobs.values())
+
+
+def cancel(job: ImportJob) -> bool:
+    """Request cancellation; False if the job already finished."""
+    if job.task is None or job.task.done():
+        return False
+    job.task.cancel()
+    return True
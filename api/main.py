@@ -1,13 +1,17 @@
 # api/main.py
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-import os, time
-from collections import defaultdict
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session
+import os, math, asyncio
 
 from .db import init_db
-from .routers import import_router, logs_router, search_router, timeline_router, export_router
+from . import cache, fts, metrics, ratelimit, runs
+from .deps import get_read_db, require_api_key
+from parser.pipeline import shutdown_pools
+from .routers import import_router, logs_router, search_router, timeline_router, export_router, runs_router
 from .routers.demo_router import router as demo_router  # NEW
 
 # Initialize DB + FTS5/triggers
@@ -23,25 +27,42 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
-# Very small in-memory rate limit
-RATE_LIMIT = int(os.getenv("RATE_LIMIT", "120"))     # req per window
-RATE_WINDOW = int(os.getenv("RATE_WINDOW", "60"))    # seconds
-_buckets: dict[str, list[float]] = defaultdict(list)
+# Index id ranges left by imports that deferred FTS indexing
+@app.on_event("startup")
+async def start_fts_indexer():
+    if fts.FTS_INDEX_INTERVAL > 0:
+        app.state.fts_indexer = asyncio.create_task(fts.background_indexer())
 
+# Drop runs past the retention policy and vacuum incrementally
+@app.on_event("startup")
+async def start_retention():
+    if runs.RETENTION_INTERVAL > 0 and (runs.RETENTION_DAYS > 0 or runs.RETENTION_MAX_BYTES > 0):
+        app.state.retention = asyncio.create_task(runs.background_retention())
+
+# Stop import worker processes
+@app.on_event("shutdown")
+def stop_import_workers():
+    shutdown_pools()
+
+# Per-client token bucket; imports and exports cost more than reads (api.ratelimit)
 @app.middleware("http")
 async def rate_limiter(request: Request, call_next):
     key = request.headers.get("X-API-Key") or f"ip:{request.client.host if request.client else 'unknown'}"
-    now = time.time()
-    bucket = _buckets[key]
-    cutoff = now - RATE_WINDOW
-    while bucket and bucket[0] < cutoff:
-        bucket.pop(0)
-    if len(bucket) >= RATE_LIMIT:
-        from fastapi.responses import JSONResponse
-        return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
-    bucket.append(now)
+    wait = ratelimit.limiter.check(key, ratelimit.limiter.cost(request.method, request.url.path))
+    if wait:
+        return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429,
+                            headers={"Retry-After": str(math.ceil(wait))})
     return await call_next(request)
 
+# Writer connection still taken after SQLITE_WRITE_WAIT (e.g. a long import commit): retryable
+@app.exception_handler(PoolTimeout)
+async def writer_busy(request: Request, exc: PoolTimeout):
+    return JSONResponse({"detail": "Database busy, retry shortly"}, status_code=503,
+                        headers={"Retry-After": "5"})
+
+# Outermost: times every request by route template, 429s and CORS included (api.metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Routers
 app.include_router(import_router.router)
 app.include_router(demo_router)              # NEW
@@ -49,6 +70,7 @@ app.include_router(logs_router.router)
 app.include_router(search_router.router)
 app.include_router(timeline_router.router)
 app.include_router(export_router.router)
+app.include_router(runs_router.router)
 
 # Serve the built SPA on /app
 app.mount("/app", StaticFiles(directory="web_project/dist", html=True), name="app")
@@ -60,6 +82,26 @@ def favicon():
         return FileResponse(path)
     return Response(status_code=204)
 
+@app.get("/cache/stats", tags=["meta"])
+def cache_stats(_: None = Depends(require_api_key)):
+    """Hit/miss/eviction counters of the in-process caches (this worker only)."""
+    return {"responses": cache.responses.stats(), "facets": cache.facets.stats()}
+
+@app.get("/ratelimit/stats", tags=["meta"])
+def ratelimit_stats(_: None = Depends(require_api_key)):
+    """Rate limiter counters (this worker only)."""
+    return ratelimit.limiter.stats()
+
+@app.get("/metrics", tags=["meta"])
+def prometheus_metrics(db: Session = Depends(get_read_db), _: None = Depends(require_api_key)):
+    """Prometheus text format: request/SQL/import timings, DB size and row counts (this worker)."""
+    return Response(metrics.render(db.connection()), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/metrics/slow", tags=["meta"])
+def slow_queries(_: None = Depends(require_api_key)):
+    """Most recent statements over SLOW_QUERY_MS, with their query plans (this worker only)."""
+    return {"threshold_ms": metrics.SLOW_QUERY_MS, "queries": list(reversed(metrics.slow_queries))}
+
 @app.get("/")
 def root():
     return {"ok": True, "service": "terraform-logviewer"}
\ No newline at end of file
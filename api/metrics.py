@@ -0,0 +1,307 @@
+# In-process metrics in the Prometheus text format (GET /metrics).
+# - Histograms and counters are plain dicts of label values -> counts behind one lock
+#   each; an observation is a bisect and a few additions, so they stay on in production.
+# - HTTP: MetricsMiddleware times every request by route template (/logs/{log_id},
+#   not the concrete path), including streamed bodies, and records the status.
+# - SQL: cursor events on both engines time every statement by engine, statement kind
+#   and the route of the request that issued it (imports run under POST /import).
+# - Imports: per-stage seconds per batch (api.metrics.observe_stages), see IMPORT_STAGES.
+# - DB size, rate limiter and cache counters are read at scrape time; row counts (a full
+#   count(*) per table) are recounted only when the data generation (api.cache) moved.
+# - SLOW_QUERY_MS > 0 logs statements at least that slow to the `api.slow_query` logger
+#   with their EXPLAIN QUERY PLAN (never their parameters), and keeps the last
+#   SLOW_QUERY_KEEP of them for GET /metrics/slow.
+# - Like the caches, every number is per worker process.
+
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from .db import DB_PATH, engine, read_engine
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # 0 disables the slow-query log
+SLOW_QUERY_KEEP = int(os.getenv("SLOW_QUERY_KEEP", "100"))
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# decode/sanitize/normalize/extract/compress run per record (in the pipeline workers);
+# the rest are the writer's statements per batch. "payloads" includes the FTS trigger
+# when an import indexes row by row; "fts_index" is the deferred pass.
+IMPORT_STAGES = ("decode", "sanitize", "normalize", "extract", "compress", "orm_flush",
+                 "logs", "payloads", "bodies", "fields", "commit", "fts_index")
+
+log = logging.getLogger("api.slow_query")
+slow_queries: deque = deque(maxlen=max(1, SLOW_QUERY_KEEP))
+
+_registry: list = []
+# ASGI scope of the request being served; its "route" is set once routing has matched
+_scope: ContextVar[dict | None] = ContextVar("metrics_scope", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if isinstance(v, int):
+        return str(v)
+    return "+Inf" if v == math.inf else repr(v)
+
+
+class Counter:
+    """Monotonic counter per label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels: str, by: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + by
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, k)} {_num(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram of seconds per label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}  # -> [count per bucket..., count above, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, seconds: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += seconds
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(s)) for k, s in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in items:
+            total = 0
+            for le, n in zip(self.buckets + (math.inf,), s):
+                total += n
+                bound = 'le="%s"' % _num(le)
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, bound)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_num(s[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {total}")
+        return lines
+
+
+http_seconds = Histogram("logviewer_http_request_duration_seconds",
+                         "Request time until the last body byte, by route template.",
+                         ("method", "route", "status"))
+sql_seconds = Histogram("logviewer_sql_duration_seconds",
+                        "SQL statement execution time (executemany counts once).",
+                        ("engine", "route", "op"))
+import_stage_seconds = Histogram("logviewer_import_stage_seconds",
+                                 "Import time per stage and batch (pipeline chunk or writer batch).",
+                                 ("stage",))
+import_records = Counter("logviewer_import_records_total", "Records written by imports.")
+slow_total = Counter("logviewer_slow_queries_total", "Statements over SLOW_QUERY_MS.", ("engine", "route"))
+
+
+def stages() -> dict[str, float]:
+    """Empty per-stage seconds for one batch, filled by the import code."""
+    return dict.fromkeys(IMPORT_STAGES, 0.0)
+
+
+def observe_stages(timings: dict[str, float]) -> None:
+    """One import_stage_seconds observation per stage that ran; resets `timings`."""
+    for stage, seconds in timings.items():
+        if seconds:
+            import_stage_seconds.observe(seconds, stage)
+            timings[stage] = 0.0
+
+
+def current_route() -> str:
+    scope = _scope.get()
+    if scope is None:
+        return "-"
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request into http_seconds."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        token = _scope.set(scope)
+        t = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            http_seconds.observe(time.perf_counter() - t, scope["method"], current_route(), str(status[0]))
+            _scope.reset(token)
+
+
+# ---------- SQL statements ----------
+
+@lru_cache(maxsize=4096)
+def _op(statement: str) -> str:
+    word = statement.lstrip()[:8].split(None, 1)
+    word = word[0].lower() if word else ""
+    return word if word in ("select", "insert", "update", "delete", "with", "pragma") else "other"
+
+
+def _plan(dbapi_conn, statement: str, parameters) -> list[str] | None:
+    """EXPLAIN QUERY PLAN rows as an indented tree, like the sqlite3 shell prints it."""
+    if _op(statement) in ("pragma", "other"):
+        return None
+    try:
+        cur = dbapi_conn.cursor()
+        try:
+            rows = cur.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        finally:
+            cur.close()
+    except sqlite3.Error:
+        return None
+    depth: dict[int, int] = {0: -1}
+    out = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        out.append("  " * depth[node] + detail)
+    return out
+
+
+def _slow(conn: Connection, name: str, statement: str, parameters, executemany: bool, seconds: float) -> None:
+    route = current_route()
+    slow_total.inc(name, route)
+    params = parameters[0] if executemany and parameters else parameters
+    entry = {
+        "at": time.time(),
+        "ms": round(seconds * 1000, 3),
+        "engine": name,
+        "route": route,
+        "statement": " ".join(statement.split())[:2000],
+        "plan": _plan(conn.connection.driver_connection, statement, params),
+    }
+    slow_queries.append(entry)
+    log.warning("slow query %s", json.dumps(entry))
+
+
+def _instrument(eng, name: str) -> None:
+    @event.listens_for(eng, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_t"] = time.perf_counter()
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info.pop("metrics_t", time.perf_counter())
+        sql_seconds.observe(seconds, name, current_route(), _op(statement))
+        if SLOW_QUERY_MS > 0 and seconds * 1000 >= SLOW_QUERY_MS:
+            _slow(conn, name, statement, parameters, executemany, seconds)
+
+
+_instrument(engine, "write")
+_instrument(read_engine, "read")
+
+
+# ---------- Scrape ----------
+
+_TABLES = ("logs", "payloads", "bodies", "body_blobs", "log_fields", "field_values", "import_runs")
+_row_counts: tuple[int, list] | None = None  # (cache.generation, samples) of the last count
+
+
+def _family(name: str, kind: str, help: str, samples: list[tuple[dict, float]]) -> list[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_num(value)}")
+    return lines
+
+
+def _rows(conn: Connection) -> list[tuple[dict, int]]:
+    global _row_counts
+    from . import cache
+    gen = cache.generation(conn)
+    if _row_counts is None or _row_counts[0] != gen:
+        _row_counts = (gen, [({"table": t}, conn.exec_driver_sql(f"SELECT count(*) FROM {t}").scalar())
+                             for t in _TABLES])
+    return _row_counts[1]
+
+
+def _database(conn: Connection) -> list[str]:
+    pragma = lambda p: conn.exec_driver_sql(f"PRAGMA {p}").scalar()
+    page_size = pragma("page_size")
+    wal = f"{DB_PATH}-wal"
+    files = [({"file": "main"}, os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0),
+             ({"file": "wal"}, os.path.getsize(wal) if os.path.exists(wal) else 0)]
+    rows = _rows(conn)
+    pending = conn.exec_driver_sql("SELECT COALESCE(SUM(hi - lo + 1), 0) FROM fts_pending").scalar()
+    return (
+        _family("logviewer_db_file_bytes", "gauge", "Database files on disk.", files)
+        + _family("logviewer_db_page_bytes", "gauge", "Database pages in use and on the freelist.", [
+            ({"state": "used"}, (pragma("page_count") - pragma("freelist_count")) * page_size),
+            ({"state": "free"}, pragma("freelist_count") * page_size),
+        ])
+        + _family("logviewer_db_rows", "gauge", "Rows per table.", rows)
+        + _family("logviewer_fts_pending_rows", "gauge", "Rows waiting for deferred FTS indexing.", [({}, pending)])
+    )
+
+
+def _process() -> list[str]:
+    from . import cache, ratelimit
+    rl = ratelimit.limiter.stats()
+    lines = _family("logviewer_ratelimit_requests_total", "counter", "Rate limiter decisions.", [
+        ({"result": "allowed"}, rl["allowed"]), ({"result": "limited"}, rl["limited"]),
+    ])
+    lines += _family("logviewer_ratelimit_keys", "gauge", "Clients tracked by the rate limiter.", [({}, rl["keys"])])
+    lines += _family("logviewer_ratelimit_evicted_total", "counter", "Idle clients dropped.", [({}, rl["evicted"])])
+    caches = {"responses": cache.responses.stats(), "facets": cache.facets.stats()}
+    for key, kind, help in (("hits", "counter", "Cache hits."), ("misses", "counter", "Cache misses."),
+                            ("evictions", "counter", "Cache evictions."), ("weight", "gauge", "Cache size in its unit.")):
+        name = f"logviewer_cache_{key}" + ("_total" if kind == "counter" else "")
+        lines += _family(name, kind, help, [({"cache": c}, s[key]) for c, s in caches.items()])
+    return lines
+
+
+def render(conn: Connection) -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    lines += _database(conn) + _process()
+    return "\n".join(lines) + "\n"
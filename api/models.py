@@ -1,32 +1,135 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Text, Boolean, ForeignKey
-from pydantic import BaseModel
+from sqlalchemy import String, Integer, BigInteger, Boolean, ForeignKey, Index, LargeBinary, UniqueConstraint
+from pydantic import BaseModel, Field
 from .db import Base
+from .compression import pack, unpack
 
 class Log(Base):
-    """Main log row with lightweight fields and a text JSON column."""
+    """Main log row: only the narrow fields lists and filters read; raw JSON lives in Payload."""
     __tablename__ = "logs"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    ts: Mapped[str] = mapped_column(String(32), index=True)  # ISO8601 timestamp
-    level: Mapped[str] = mapped_column(String(16), index=True, default="INFO")
+    ts: Mapped[str] = mapped_column(String(32))  # timestamp as received, for display
+    ts_us: Mapped[int] = mapped_column(BigInteger, nullable=True)  # UTC epoch microseconds, for ranges/order
+    level: Mapped[str] = mapped_column(String(16), default="INFO")
     section: Mapped[str] = mapped_column(String(32), index=True, nullable=True)  # plan/apply markers
-    tf_req_id: Mapped[str] = mapped_column(String(64), index=True, nullable=True)  # request grouping
+    tf_req_id: Mapped[str] = mapped_column(String(64), nullable=True)  # request grouping
     summary: Mapped[str] = mapped_column(String(512))  # short message
     has_req_body: Mapped[bool] = mapped_column(Boolean, default=False)
     has_res_body: Mapped[bool] = mapped_column(Boolean, default=False)
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
-    raw_json: Mapped[str] = mapped_column(Text)  # sanitized original JSON as text
 
     body: Mapped["Body"] = relationship(back_populates="log", uselist=False)
+    payload: Mapped["Payload"] = relationship(back_populates="log", uselist=False)
+
+    @property
+    def raw_json(self) -> str | None:
+        """Sanitized original JSON (decompressed on access; loads the payload row)."""
+        return unpack(self.payload.raw_z) if self.payload is not None else None
+
+    @raw_json.setter
+    def raw_json(self, text: str) -> None:
+        self.payload = Payload(raw_z=pack(text))
+
+    # Time ranges, keyset pages ordered by (ts_us, id) and histograms stay on an index;
+    # SQLite appends the rowid to every index, so ix_logs_ts_us is exactly the page order
+    # (with the level column in between, (ts_us, level) would need a sort for each page).
+    # AUTOINCREMENT: ids freed by dropping the newest run are never handed out again
+    __table_args__ = (
+        Index("ix_logs_ts_us", "ts_us"),
+        Index("ix_logs_ts_us_level", "ts_us", "level"),
+        Index("ix_logs_level_ts_us", "level", "ts_us"),
+        Index("ix_logs_tf_req_id_ts_us", "tf_req_id", "ts_us"),
+        {"sqlite_autoincrement": True},
+    )
 
 class Body(Base):
-    """Holds lazy-loaded request/response JSON blobs for a log row."""
+    """Points a log row at its request/response bodies in the shared blob store."""
     __tablename__ = "bodies"
     log_id: Mapped[int] = mapped_column(ForeignKey("logs.id"), primary_key=True)
-    req_body_json: Mapped[str] = mapped_column(Text, nullable=True)
-    res_body_json: Mapped[str] = mapped_column(Text, nullable=True)
+    req_blob_id: Mapped[int] = mapped_column(ForeignKey("body_blobs.id"), nullable=True)
+    res_blob_id: Mapped[int] = mapped_column(ForeignKey("body_blobs.id"), nullable=True)
     log: Mapped[Log] = relationship(back_populates="body")
 
+class BodyBlob(Base):
+    """One request/response body per distinct content (SHA-256), zlib-compressed; see api.body_store."""
+    __tablename__ = "body_blobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    hash: Mapped[bytes] = mapped_column(LargeBinary, unique=True)
+    size: Mapped[int] = mapped_column(Integer)  # uncompressed bytes
+    refcount: Mapped[int] = mapped_column(Integer, default=0)  # kept by triggers on `bodies`
+    data_z: Mapped[bytes] = mapped_column(LargeBinary)
+
+class Payload(Base):
+    """Cold storage: sanitized original JSON of a log row, zlib-compressed."""
+    __tablename__ = "payloads"
+    log_id: Mapped[int] = mapped_column(ForeignKey("logs.id"), primary_key=True)
+    raw_z: Mapped[bytes] = mapped_column(LargeBinary)
+    log: Mapped[Log] = relationship(back_populates="payload")
+
+class FieldValue(Base):
+    """One distinct (name, value) of an extracted tflog attribute (name in api.fields.FIELDS)."""
+    __tablename__ = "field_values"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(64))
+    value: Mapped[str] = mapped_column(String(512))
+    __table_args__ = (
+        UniqueConstraint("name", "value"),
+    )
+
+class LogField(Base):
+    """Log row carries an extracted attribute value; two integers per pair, values are interned."""
+    __tablename__ = "log_fields"
+    value_id: Mapped[int] = mapped_column(ForeignKey("field_values.id"), primary_key=True)
+    log_id: Mapped[int] = mapped_column(ForeignKey("logs.id"), primary_key=True, index=True)
+
+    # Filters and per-value counts are range scans of the primary key
+    __table_args__ = (
+        {"sqlite_with_rowid": False},
+    )
+
+class ImportRun(Base):
+    """One import (file upload, job or demo seed); its rows are the id ranges in RunRange."""
+    __tablename__ = "import_runs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    filename: Mapped[str] = mapped_column(String(256), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), default="running")  # running | done | failed | cancelled | deleting
+    started_us: Mapped[int] = mapped_column(BigInteger)
+    finished_us: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    records: Mapped[int] = mapped_column(Integer, default=0)  # rows stored
+    bytes: Mapped[int] = mapped_column(BigInteger, default=0)  # upload size read
+    first_us: Mapped[int] = mapped_column(BigInteger, nullable=True)  # ts_us span of its rows
+    last_us: Mapped[int] = mapped_column(BigInteger, nullable=True)
+
+    # Ids are never reused, so a `run=` link never points at a later import
+    __table_args__ = (
+        {"sqlite_autoincrement": True},
+    )
+
+class RunRange(Base):
+    """Consecutive log ids written by one run (one per transaction, merged when adjacent)."""
+    __tablename__ = "run_ranges"
+    run_id: Mapped[int] = mapped_column(ForeignKey("import_runs.id"), primary_key=True)
+    lo: Mapped[int] = mapped_column(Integer, primary_key=True)
+    hi: Mapped[int] = mapped_column(Integer)
+
+class RequestSpan(Base):
+    """Per-tf_req_id summary for /timeline, maintained incrementally by api.timeline."""
+    __tablename__ = "request_spans"
+    tf_req_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    start_us: Mapped[int] = mapped_column(BigInteger)
+    end_us: Mapped[int] = mapped_column(BigInteger)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    n_trace: Mapped[int] = mapped_column(Integer, default=0)
+    n_debug: Mapped[int] = mapped_column(Integer, default=0)
+    n_info: Mapped[int] = mapped_column(Integer, default=0)
+    n_warn: Mapped[int] = mapped_column(Integer, default=0)
+    n_error: Mapped[int] = mapped_column(Integer, default=0)
+
+    # Keyset pages ordered by (start_us, tf_req_id), bounded below by the window start
+    __table_args__ = (
+        Index("ix_request_spans_start", "start_us", "tf_req_id"),
+    )
+
 # ---- Pydantic response schemas ----
 class LogOut(BaseModel):
     id: int
@@ -42,4 +145,61 @@ class LogOut(BaseModel):
         from_attributes = True  # allows ORM -> Pydantic conversion
 
 class LogDetail(LogOut):
-    raw_json: str
\ No newline at end of file
+    raw_json: str
+
+class LogPage(BaseModel):
+    """Keyset page; pass `next`/`prev` back as `cursor` (None at either end)."""
+    items: list[LogOut]
+    next: str | None
+    prev: str | None
+
+class SearchHit(LogOut):
+    """/search row; `snippet` (HTML, terms in <mark>) and `score` (BM25, higher is better) when requested."""
+    snippet: str | None = None
+    score: float | None = None
+
+class SearchPage(BaseModel):
+    items: list[SearchHit]
+    next: str | None
+    prev: str | None
+
+class SpanOut(BaseModel):
+    tf_req_id: str
+    start: str
+    end: str
+    count: int
+    levels: dict[str, int]
+
+class SpanPage(BaseModel):
+    items: list[SpanOut]
+    next: str | None
+    prev: str | None
+
+class RunOut(BaseModel):
+    id: int
+    filename: str | None
+    status: str
+    started: str
+    finished: str | None
+    records: int
+    bytes: int
+    first: str | None  # earliest / latest log timestamp in the run
+    last: str | None
+
+class SearchFilter(BaseModel):
+    """Same filters as GET /search, sent as a JSON body."""
+    q: str | None = None
+    level: str | None = None
+    tf_req_id: str | None = None
+    from_ts: str | None = None
+    to_ts: str | None = None
+    field: list[str] | None = None
+    run: int | None = None
+
+class ReadState(BaseModel):
+    is_read: bool = True
+
+class BulkReadState(ReadState):
+    """Target either explicit ids or every row matching `filter`."""
+    ids: list[int] | None = Field(None, max_length=10_000)
+    filter: SearchFilter | None = None
@@ -0,0 +1,64 @@
+# Keyset (cursor) pagination.
+# A cursor is the sort key of the first/last row of a page plus a direction,
+# base64url-encoded JSON; the next page is a range scan starting after that key,
+# so its cost does not grow with depth the way OFFSET does.
+
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import Session
+
+
+def encode_cursor(key: list, direction: str) -> str:
+    raw = json.dumps({"k": key, "d": direction}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: list[type]) -> tuple[list, str]:
+    """
+    Return (key, direction); 400 for anything that is not a cursor of this shape,
+    i.e. one value of exactly `types[i]` (int or str) per key column.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key, direction = data["k"], data["d"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+    if direction not in ("next", "prev") or not isinstance(key, list) or len(key) != len(types):
+        raise HTTPException(400, "Invalid cursor")
+    if any(type(v) is not t for v, t in zip(key, types)):  # `type is`: a bool is not an int key
+        raise HTTPException(400, "Invalid cursor")
+    return key, direction
+
+
+def keyset_page(db: Session, stmt: Select, cols: list, cursor: str | None, limit: int) -> dict:
+    """
+    Run `stmt` ordered by `cols` (a unique key, e.g. (ts, id) or id) one page at a time.
+    Returns {"items", "next", "prev"} with opaque cursors, None at either end.
+    """
+    key_expr = tuple_(*cols) if len(cols) > 1 else cols[0]
+    after, direction = (None, "next")
+    if cursor:
+        after, direction = decode_cursor(cursor, [c.type.python_type for c in cols])
+        bound = tuple_(*after) if len(cols) > 1 else after[0]
+        stmt = stmt.where(key_expr > bound if direction == "next" else key_expr < bound)
+    order = cols if direction == "next" else [c.desc() for c in cols]
+    rows = db.execute(stmt.order_by(*order).limit(limit + 1)).scalars().all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+
+    def key_of(row) -> list:
+        return [getattr(row, c.key) for c in cols]
+
+    has_next = more if direction == "next" else after is not None
+    has_prev = after is not None if direction == "next" else more
+    return {
+        "items": rows,
+        "next": encode_cursor(key_of(rows[-1]), "next") if rows and has_next else None,
+        "prev": encode_cursor(key_of(rows[0]), "prev") if rows and has_prev else None,
+    }
@@ -0,0 +1,88 @@
+# Per-client rate limiting (token bucket).
+# - Each key (API key, else client IP) holds up to RATE_LIMIT tokens, refilled at
+#   RATE_LIMIT per RATE_WINDOW seconds; a request spends its route's cost.
+# - A check is O(1): the state is two floats per key in an OrderedDict kept in
+#   last-seen order, so idle keys sit at the front.
+# - Keys idle for a full window are dropped (their bucket would be full again, so
+#   forgetting them changes nothing); RATE_LIMIT_KEYS caps the table regardless.
+
+import os
+import time
+from collections import OrderedDict
+
+RATE_LIMIT = int(os.getenv("RATE_LIMIT", "120"))     # req per window
+RATE_WINDOW = int(os.getenv("RATE_WINDOW", "60"))    # seconds
+RATE_LIMIT_KEYS = int(os.getenv("RATE_LIMIT_KEYS", "100000"))  # tracked clients at most
+# Request cost by path prefix, "[METHOD ]prefix=cost,..."; longest prefix wins, default 1.
+# Uploads and exports scan or write whole files; job-status polls stay at 1
+RATE_COSTS = os.getenv("RATE_COSTS", "POST /import=10,GET /export=5")
+
+
+def parse_costs(spec: str) -> list[tuple[str, float]]:
+    costs = []
+    for part in spec.split(","):
+        if "=" in part:
+            prefix, cost = part.split("=", 1)
+            costs.append((prefix.strip(), float(cost)))
+    return sorted(costs, key=lambda c: len(c[0].split(" ")[-1]), reverse=True)
+
+
+class TokenBucketLimiter:
+    """`capacity` requests per `window` seconds per key, with bursts up to `capacity`."""
+
+    def __init__(self, capacity: float, window: float, max_keys: int = RATE_LIMIT_KEYS,
+                 costs: list[tuple[str, float]] | None = None, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / window  # tokens per second
+        self.window = window
+        self.max_keys = max_keys
+        self.costs = costs or []
+        self.clock = clock
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()  # key -> [tokens, last seen]
+
+    def cost(self, method: str, path: str) -> float:
+        route = f"{method} {path}"
+        for prefix, cost in self.costs:
+            if (path if prefix.startswith("/") else route).startswith(prefix):
+                return cost
+        return 1.0
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, seen) = next(iter(buckets.items()))
+            if now - seen < self.window and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+            self.evicted += 1
+
+    def check(self, key: str, cost: float = 1.0) -> float:
+        """Spend `cost` tokens for `key`. Returns 0 if allowed, else seconds until it would be."""
+        if cost > self.capacity:
+            cost = self.capacity  # an oversized cost still passes on a full bucket
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.capacity, now]
+            self._evict(now)
+        else:
+            tokens = bucket[0] + (now - bucket[1]) * self.rate
+            bucket[0] = tokens if tokens < self.capacity else self.capacity
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            self.allowed += 1
+            return 0.0
+        self.limited += 1
+        return (cost - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets), "max_keys": self.max_keys, "allowed": self.allowed,
+                "limited": self.limited, "evicted": self.evicted}
+
+
+limiter = TokenBucketLimiter(RATE_LIMIT, RATE_WINDOW, costs=parse_costs(RATE_COSTS))
@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from api.deps import get_db
 from api.models import Log, Body
+from api import body_store, cache, runs, timeline
 from datetime import datetime, timedelta
+import json
+from parser.timestamps import to_epoch_us
 
 router = APIRouter(prefix="/import", tags=["import"])
 
@@ -48,21 +51,29 @@ def seed_demo(db: Session = Depends(get_db)):
         },
     ]
 
+    run_id = runs.start(db.connection(), "demo")
     for s in samples:
         ts = (now + timedelta(seconds=s["delta"])).isoformat() + "Z"
         log = Log(
             level=s["level"],
             summary=s["summary"],
             ts=ts,
+            ts_us=to_epoch_us(ts),
             section=s["section"],
             has_req_body=bool(s["req"]),
             has_res_body=bool(s["res"]),
             is_read=False,
             tf_req_id=None,
+            raw_json=json.dumps({k: v for k, v in s.items() if k != "delta"} | {"ts": ts}),
         )
         db.add(log); db.flush()
+        runs.add_range(db.connection(), run_id, log.id, log.id, log.ts_us, log.ts_us)
         if s["req"] or s["res"]:
-            db.add(Body(log_id=log.id, req=s["req"], res=s["res"]))
+            req_id, res_id = body_store.put_many(db.connection(), [s["req"], s["res"]])
+            db.add(Body(log_id=log.id, req_blob_id=req_id, res_blob_id=res_id))
 
+    runs.finish(db.connection(), run_id, "done", 0)
+    timeline.refresh(db.connection())
+    cache.bump(db.connection())
     db.commit()
-    return {"ok": True, "inserted": len(samples)}
\ No newline at end of file
+    return {"ok": True, "inserted": len(samples), "run_id": run_id}
\ No newline at end of file
@@ -1,25 +1,119 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-from ..deps import get_db, require_api_key
-from ..models import Log
+from sqlalchemy import select, and_, func
+from ..db import read_engine
+from ..deps import require_api_key
+from ..filters import log_conditions, search_filter
+from ..models import Log, Body, BodyBlob, Payload, SearchFilter
+import csv
+import io
 import json
+import os
+import zlib
 
 router = APIRouter(prefix="/export", tags=["export"])
 
-@router.get("", summary="Export filtered logs NDJSON")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))  # rows per fetch / output chunk
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+# Columns a client may project; raw_json and bodies are opt-in
+FIELDS = ("id", "ts", "ts_us", "level", "section", "tf_req_id", "summary",
+          "has_req_body", "has_res_body", "is_read")
+DEFAULT_FIELDS = "id,ts,level,section,tf_req_id,summary"
+
+_logs = Log.__table__
+_bodies = Body.__table__
+_payloads = Payload.__table__
+_blobs = BodyBlob.__table__
+
+
+def _ndjson(names: list[str], extra: list[str]):
+    """Batch -> NDJSON text; stored JSON (raw_json, bodies) is spliced in as-is, not re-parsed."""
+    n = len(names)
+    dumps = json.dumps
+
+    def encode(rows) -> str:
+        if not extra:
+            return "".join(dumps(dict(zip(names, r))) + "\n" for r in rows)
+        out = []
+        for r in rows:
+            line = dumps(dict(zip(names, r[:n])))[:-1]
+            for name, value in zip(extra, r[n:]):
+                line += f', "{name}": {value if value is not None else "null"}'
+            out.append(line + "}\n")
+        return "".join(out)
+    return encode
+
+
+def _csv(header: list[str]):
+    def encode(rows) -> str:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue()
+    encode.header = ",".join(header) + "\r\n"
+    return encode
+
+
+def _gzip(chunks):
+    z = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = z.compress(chunk.encode())
+        if data:
+            yield data
+    yield z.flush()
+
+
+@router.get("", summary="Export filtered logs as NDJSON or CSV")
 def export_all(
-    db: Session = Depends(get_db),
+    f: SearchFilter = Depends(search_filter),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    fields: str = Query(DEFAULT_FIELDS, description="comma-separated: " + ",".join(FIELDS)),
+    raw: bool = Query(False, description="include raw_json"),
+    bodies: bool = Query(False, description="include req_body / res_body"),
+    gzip: bool = Query(False, description="gzip the stream (.gz attachment)"),
     _: None = Depends(require_api_key),
 ):
-    """Stream logs as NDJSON for external tools (monitoring, incident mgmt)."""
+    """
+    Stream logs matching the /search filters for external tools (monitoring, incident mgmt).
+    Reads only the projected columns in EXPORT_BATCH_SIZE batches on its own connection,
+    so memory stays flat regardless of the row count.
+    """
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in FIELDS]
+    if unknown or not names:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields")
+    extra = (["raw_json"] if raw else []) + (["req_body", "res_body"] if bodies else [])
+
+    cols = [_logs.c[f] for f in names]
+    source = _logs
+    if raw:
+        cols.append(func.inflate(_payloads.c.raw_z))  # SQL function registered in api.db
+        source = source.outerjoin(_payloads, _payloads.c.log_id == _logs.c.id)
+    if bodies:
+        req, res = _blobs.alias("req_blob"), _blobs.alias("res_blob")
+        cols += [func.inflate(req.c.data_z), func.inflate(res.c.data_z)]
+        source = source.outerjoin(_bodies, _bodies.c.log_id == _logs.c.id) \
+            .outerjoin(req, req.c.id == _bodies.c.req_blob_id) \
+            .outerjoin(res, res.c.id == _bodies.c.res_blob_id)
+    stmt = select(*cols).select_from(source).order_by(_logs.c.id)
+    conds = log_conditions(**f.model_dump())  # 400s surface before streaming
+    if conds:
+        stmt = stmt.where(and_(*conds))
+
+    encode = _ndjson(names, extra) if format == "ndjson" else _csv(names + extra)
+
     def gen():
-        stmt = select(Log).order_by(Log.id)
-        for row in db.execute(stmt).scalars():
-            yield json.dumps({
-                "id": row.id, "ts": row.ts, "level": row.level, "section": row.section,
-                "tf_req_id": row.tf_req_id, "summary": row.summary
-            }) + "\n"
-    return StreamingResponse(gen(), media_type="application/x-ndjson",
-                             headers={"Content-Disposition": "attachment; filename=logs.ndjson"})
\ No newline at end of file
+        if format == "csv":
+            yield encode.header
+        with read_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(stmt)
+            for rows in result.partitions(EXPORT_BATCH_SIZE):
+                yield encode(rows)
+
+    filename = f"logs.{format}"
+    media = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    body = gen()
+    if gzip:
+        body, filename, media = _gzip(body), filename + ".gz", "application/gzip"
+    return StreamingResponse(body, media_type=media,
+                             headers={"Content-Disposition": f"attachment; filename={filename}"})
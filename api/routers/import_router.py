@@ -1,18 +1,68 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from ..deps import get_db, require_api_key
-from parser.main import import_file_like
+from .. import jobs
+from parser.main import import_file_like, ImportProgress
+from parser.bulk_writer import BATCH_SIZE
 
 router = APIRouter(prefix="/import", tags=["import"])
 
+def import_options(
+    stream: bool = Query(True, description="read the upload in chunks (flat memory)"),
+    writer: str = Query("bulk", pattern="^(orm|bulk)$", description="bulk: batched inserts, chunked commits"),
+    batch_size: int = Query(BATCH_SIZE, ge=1, le=50_000),
+    fts_index: str = Query("deferred", pattern="^(trigger|deferred|background)$",
+                           description="bulk writer: per-row trigger, one pass after commit, or background"),
+) -> dict:
+    """Ingest options shared by /import and /import/jobs."""
+    return dict(stream=stream, writer=writer, batch_size=batch_size, fts_index=fts_index)
+
 @router.post("", summary="Import File")
 async def import_file(
     file: UploadFile = File(...),
+    options: dict = Depends(import_options),
     db: Session = Depends(get_db),
     _: None = Depends(require_api_key),
 ):
     """Accept a log file (NDJSON or JSON array) and ingest it into SQLite."""
     if not file.filename:
         raise HTTPException(400, "No filename")
-    count = await import_file_like(file, db)
-    return {"imported": count}
\ No newline at end of file
+    progress = ImportProgress()
+    async with jobs.import_slot():
+        count = await import_file_like(file, db, progress=progress, **options)
+    return {"imported": count, "bytes": progress.bytes_read, "run_id": progress.run_id}
+
+@router.post("/jobs", status_code=202, summary="Start import job")
+async def start_job(
+    file: UploadFile = File(...),
+    options: dict = Depends(import_options),
+    _: None = Depends(require_api_key),
+):
+    """Queue the file for background ingestion and return the job id immediately."""
+    if not file.filename:
+        raise HTTPException(400, "No filename")
+    job = await jobs.submit(file, options)
+    return job.to_dict()
+
+@router.get("/jobs", summary="List import jobs")
+def list_jobs(_: None = Depends(require_api_key)):
+    """Recent jobs, oldest first."""
+    return [j.to_dict() for j in jobs.all_jobs()]
+
+@router.get("/jobs/{job_id}", summary="Import job status")
+def job_status(job_id: str, _: None = Depends(require_api_key)):
+    """Status, records/bytes processed, throughput, ETA and error of one job."""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}", summary="Cancel import job")
+def cancel_job(job_id: str, _: None = Depends(require_api_key)):
+    """Cancel a queued or running job; committed chunks stay imported."""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    if not jobs.cancel(job):
+        raise HTTPException(409, f"Job already {job.status}")
+    return {"ok": True}
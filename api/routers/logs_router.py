@@ -1,57 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlalchemy import select, update, and_
 from sqlalchemy.orm import Session
-from ..deps import get_db, require_api_key
-from ..models import Log, Body, LogOut, LogDetail
+from ..deps import get_db, get_read_db, require_api_key
+from .. import body_store, cache
+from ..filters import log_conditions
+from ..http_cache import cached_json
+from ..models import Log, Body, LogOut, LogDetail, LogPage, ReadState, BulkReadState
+from ..pagination import keyset_page
 
 router = APIRouter(prefix="/logs", tags=["logs"])
+_LIST = TypeAdapter(list[LogOut] | LogPage)
+_DETAIL = TypeAdapter(LogDetail)
 
-@router.get("", response_model=list[LogOut], summary="List")
+@router.get("", response_model=list[LogOut] | LogPage, summary="List")
 def list_logs(
+    request: Request,
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    paging: str = Query("offset", pattern="^(offset|cursor)$", description="cursor: keyset pages with next/prev"),
+    cursor: str | None = Query(None, description="next/prev value from a previous page (implies paging=cursor)"),
+    db: Session = Depends(get_read_db),
     _: None = Depends(require_api_key),
 ):
-    """List log rows (without heavy bodies), paginated."""
-    rows = db.execute(select(Log).order_by(Log.id).limit(limit).offset(offset)).scalars().all()
-    return rows
+    """List log rows (without heavy bodies), paginated by offset or by id cursor; conditional/cached."""
+    def page():
+        if paging == "cursor" or cursor:
+            return keyset_page(db, select(Log), [Log.id], cursor, limit)
+        return db.execute(select(Log).order_by(Log.id).limit(limit).offset(offset)).scalars().all()
+    return cached_json(request, db, page, _LIST)
 
 @router.get("/{log_id}", response_model=LogDetail, summary="Get")
 def get_log(
     log_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     _: None = Depends(require_api_key)
 ):
-    """Fetch a single log row including raw_json."""
-    row = db.get(Log, log_id)
-    if not row:
-        raise HTTPException(404, "Log not found")
-    return row
+    """Fetch a single log row including raw_json; conditional/cached."""
+    def detail():
+        row = db.get(Log, log_id)
+        if not row:
+            raise HTTPException(404, "Log not found")
+        return row
+    return cached_json(request, db, detail, _DETAIL)
 
 @router.get("/{log_id}/body", summary="Body")
 def get_body(
     log_id: int,
     part: str = Query("req", pattern="^(req|res)$"),
-    db: Session = Depends(get_db),
+    preview: int | None = Query(None, ge=1, description="return only the first N bytes"),
+    pretty: bool = Query(False, description="indent the (preview) text"),
+    db: Session = Depends(get_read_db),
     _: None = Depends(require_api_key),
 ):
-    """Lazy fetch request or response JSON for a log."""
+    """Lazy fetch request or response JSON for a log, whole or as a preview; `size` is the full length in bytes."""
     b = db.get(Body, log_id)
     if not b:
         raise HTTPException(404, "No body")
-    return {"part": part, "json": b.req_body_json if part == "req" else b.res_body_json}
+    blob_id = b.req_blob_id if part == "req" else b.res_blob_id
+    if blob_id is None:
+        return {"part": part, "json": None, "size": 0, "truncated": False}
+    return {"part": part, **body_store.read(db.connection(), blob_id, preview, pretty)}
+
+@router.patch("/read", summary="Bulk mark read/unread")
+def mark_read_bulk(
+    payload: BulkReadState,
+    db: Session = Depends(get_db),
+    _: None = Depends(require_api_key),
+):
+    """Set read state for a list of ids or for every row matching a /search filter, in one UPDATE."""
+    if payload.ids is None and payload.filter is None:
+        raise HTTPException(400, "Provide ids or filter")
+    conds = [Log.is_read != payload.is_read]  # skip rows already in the target state
+    if payload.ids is not None:
+        conds.append(Log.id.in_(payload.ids))
+    if payload.filter is not None:
+        conds += log_conditions(**payload.filter.model_dump())
+    stmt = update(Log).where(and_(*conds)).values(is_read=payload.is_read) \
+        .execution_options(synchronize_session=False)
+    updated = db.execute(stmt).rowcount
+    if updated:
+        cache.bump(db.connection())
+    db.commit()
+    return {"ok": True, "updated": updated}
 
 @router.patch("/{log_id}/read", summary="Mark as read")
 def mark_read(
     log_id: int,
+    state: ReadState | None = None,
     db: Session = Depends(get_db),
     _: None = Depends(require_api_key),
 ):
-    """Mark a log as 'read' to hide it from anomaly views later."""
-    row = db.get(Log, log_id)
-    if not row:
+    """Mark a log as 'read' (or unread with is_read=false) to hide it from anomaly views later."""
+    is_read = state.is_read if state else True
+    res = db.execute(update(Log).where(Log.id == log_id).values(is_read=is_read)
+                     .execution_options(synchronize_session=False))
+    if not res.rowcount:
         raise HTTPException(404, "Not found")
-    row.is_read = True
+    cache.bump(db.connection())
     db.commit()
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True}
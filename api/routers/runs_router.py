@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from ..deps import get_read_db, require_api_key
+from .. import runs
+from ..models import RunOut
+
+router = APIRouter(prefix="/runs", tags=["runs"])
+
+@router.get("", response_model=list[RunOut], summary="List import runs")
+def list_runs(db: Session = Depends(get_read_db), _: None = Depends(require_api_key)):
+    """Every import, job and demo seed, newest first; filter /search, /export etc. with `run=<id>`."""
+    return runs.list_runs(db.connection())
+
+@router.get("/{run_id}", response_model=RunOut, summary="Import run")
+def get_run(run_id: int, db: Session = Depends(get_read_db), _: None = Depends(require_api_key)):
+    run = runs.get(db.connection(), run_id)
+    if run is None:
+        raise HTTPException(404, "Run not found")
+    return run
+
+@router.delete("/{run_id}", summary="Drop import run")
+def drop_run(run_id: int, db: Session = Depends(get_read_db), _: None = Depends(require_api_key)):
+    """Delete the run and its rows in chunks, then give the freed pages back (incremental vacuum)."""
+    run = runs.get(db.connection(), run_id)
+    db.close()  # the drop below takes its time; do not hold a reader meanwhile
+    if run is None:
+        raise HTTPException(404, "Run not found")
+    deleted = runs.drop(run_id)
+    if deleted is None:
+        raise HTTPException(409, f"Run is {run['status']}")
+    return {"ok": True, "deleted": deleted, "vacuumed_pages": runs.vacuum()}
+
+@router.post("/retention", summary="Apply retention now")
+def apply_retention(_: None = Depends(require_api_key)):
+    """Drop runs past RETENTION_DAYS / over RETENTION_MAX_BYTES without waiting for the background pass."""
+    dropped = runs.apply_retention()
+    return {"dropped": dropped, "vacuumed_pages": runs.vacuum()}
@@ -1,36 +1,139 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import text, select, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlalchemy import select, and_, func
 from sqlalchemy.orm import Session
-from ..deps import get_db, require_api_key
-from ..models import Log, LogOut
+from ..deps import get_read_db, require_api_key
+from ..filters import log_conditions, filter_key, match_expr, search_filter, text_condition
+from .. import cache, fields, fts_query
+from ..http_cache import cached_json
+from ..models import Log, LogField, FieldValue, SearchFilter, SearchHit, SearchPage
+from ..pagination import keyset_page
 
 router = APIRouter(prefix="/search", tags=["search"])
+_LIST = TypeAdapter(list[SearchHit] | SearchPage)
 
-@router.get("", response_model=list[LogOut])
+@router.get("", response_model=list[SearchHit] | SearchPage)
 def search(
-    q: str | None = Query(None, description="full-text over summary/raw_json"),
-    level: str | None = None,
-    tf_req_id: str | None = None,
-    from_ts: str | None = None,
-    to_ts: str | None = None,
+    request: Request,
+    f: SearchFilter = Depends(search_filter),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    paging: str = Query("offset", pattern="^(offset|cursor)$", description="cursor: keyset pages with next/prev"),
+    cursor: str | None = Query(None, description="next/prev value from a previous page (implies paging=cursor)"),
+    order: str = Query("time", pattern="^(time|rank)$", description="rank: best BM25 match first (needs q, offset paging)"),
+    snippet: bool = Query(False, description="add an HTML excerpt with the matched terms in <mark> (needs q)"),
+    db: Session = Depends(get_read_db),
     _: None = Depends(require_api_key),
 ):
-    """Compound search: filters + optional FTS5 match over summary/raw_json."""
-    # Base filters
-    stmt = select(Log)
-    conds = []
-    if level: conds.append(Log.level == level)
-    if tf_req_id: conds.append(Log.tf_req_id == tf_req_id)
-    if from_ts: conds.append(Log.ts >= from_ts)
-    if to_ts: conds.append(Log.ts <= to_ts)
+    """
+    Compound search: filters + optional FTS5 match over summary/raw_json; conditional/cached.
+    `q` takes words, "phrases", prefix*, -exclusions and OR; every term is quoted, so no input is a syntax error.
+    """
+    keyset = paging == "cursor" or cursor
+    expr = match_expr(f.q) if f.q and f.q.strip() else None
+    if order == "rank" and (expr is None or keyset):
+        raise HTTPException(400, "order=rank needs q and offset paging")
+    conds = log_conditions(**f.model_dump(exclude={"q"}))
+
+    def page():
+        scores = {}
+        if order == "rank":
+            fts = fts_query.fts_table
+            stmt = select(Log, fts.c.rank).select_from(fts).join(Log, Log.id == fts.c.rowid) \
+                .where(fts_query.match_clause(expr), *conds).order_by(fts.c.rank, Log.id).limit(limit).offset(offset)
+            rows = db.execute(stmt).all()
+            items = result = [log for log, _ in rows]
+            scores = {log.id: -rank for log, rank in rows}  # bm25() is lower-is-better
+        else:
+            where = list(conds)
+            if expr is not None:
+                # Common terms: walk the page order and probe; rare terms: collect matches first
+                plan = fts_query.plan(db.connection(), expr, conds, limit if keyset else offset + limit)
+                where.append(text_condition(expr, plan))
+            stmt = select(Log).where(and_(*where)) if where else select(Log)
+            if keyset:
+                result = keyset_page(db, stmt, [Log.ts_us, Log.id], cursor, limit)
+                items = result["items"]
+            else:
+                # id breaks ts ties so pages are stable
+                items = result = db.execute(stmt.order_by(Log.ts_us, Log.id).limit(limit).offset(offset)).scalars().all()
+        if not (snippet and expr is not None) and not scores:
+            return result
+        excerpts = fts_query.snippets(db.connection(), expr, [r.id for r in items]) if snippet else {}
+        hits = [SearchHit.model_validate(r).model_copy(update={"snippet": excerpts.get(r.id), "score": scores.get(r.id)})
+                for r in items]
+        if keyset:
+            return result | {"items": hits}
+        return hits
+    return cached_json(request, db, page, _LIST)
+
+
+def _facets(db: Session, conds: list) -> dict:
+    """Total plus per-value counts, folded from one GROUP BY over the flag/label columns."""
+    cols = [Log.level, Log.section, Log.has_req_body, Log.has_res_body, Log.is_read]
+    stmt = select(*cols, func.count()).group_by(*cols)
     if conds:
         stmt = stmt.where(and_(*conds))
-    # Full-text search (if q is provided)
-    if q:
-        stmt = stmt.join(text("logs_fts ON logs_fts.rowid = logs.id")) \
-                   .where(text("logs_fts MATCH :qq")).params(qq=q)
-    stmt = stmt.order_by(Log.ts).limit(limit).offset(offset)
-    return db.execute(stmt).scalars().all()
\ No newline at end of file
+    out = {"total": 0, "level": {}, "section": {}, "has_req_body": {}, "has_res_body": {}, "is_read": {}}
+    for level, section, req, res, read, n in db.execute(stmt).all():
+        out["total"] += n
+        for name, value in (("level", level), ("section", section), ("has_req_body", bool(req)),
+                            ("has_res_body", bool(res)), ("is_read", bool(read))):
+            key = str(value).lower() if isinstance(value, bool) else value
+            out[name][key] = out[name].get(key, 0) + n
+    return out
+
+@router.get("/facets", summary="Match count and per-field breakdown")
+def facets(
+    f: SearchFilter = Depends(search_filter),
+    db: Session = Depends(get_read_db),
+    _: None = Depends(require_api_key),
+):
+    """Counts by level, section, has_req_body, has_res_body and is_read for a /search filter; cached per data generation."""
+    key = filter_key(**f.model_dump())
+    gen = cache.generation(db.connection())
+    return cache.facets.get_or_compute(
+        (gen, key), lambda: _facets(db, log_conditions(**f.model_dump(exclude={"q"}), q=key[0]))
+    )
+
+
+@router.get("/fields", summary="Extracted attribute names")
+def field_names(_: None = Depends(require_api_key)):
+    """Names accepted by the `field` filter (EXTRACT_FIELDS)."""
+    return {"fields": list(fields.FIELDS)}
+
+def _values(db: Session, name: str, prefix: str | None, limit: int, conds: list) -> dict:
+    v = FieldValue
+    if conds:
+        n = func.count().label("n")
+        stmt = select(v.value, n).join(LogField, LogField.value_id == v.id) \
+            .join(Log, Log.id == LogField.log_id).where(v.name == name, and_(*conds)).group_by(v.id)
+    else:
+        # One (value_id, log_id) key range count per distinct value
+        n = select(func.count()).where(LogField.value_id == v.id).scalar_subquery().label("n")
+        stmt = select(v.value, n).where(v.name == name)
+    if prefix:
+        # Range on the (name, value) index rather than LIKE
+        stmt = stmt.where(v.value >= prefix, v.value < prefix + "\U0010ffff")
+    stmt = stmt.order_by(n.desc(), v.value).limit(limit)
+    return {"field": name, "values": [{"value": val, "count": c} for val, c in db.execute(stmt).all() if c]}
+
+@router.get("/fields/{name}", summary="Distinct values of an extracted attribute with counts")
+def field_values(
+    name: str,
+    request: Request,
+    prefix: str | None = Query(None, description="only values starting with this"),
+    limit: int = Query(100, ge=1, le=1000),
+    f: SearchFilter = Depends(search_filter),
+    db: Session = Depends(get_read_db),
+    _: None = Depends(require_api_key),
+):
+    """
+    Dropdown options for a `field` filter, most frequent first, under the other /search filters
+    (`field` filters on `name` itself are ignored); conditional/cached.
+    """
+    if name not in fields.FIELDS:
+        raise HTTPException(404, "Unknown field")
+    others = [spec for spec in f.field or () if spec.partition(":")[0] != name]
+    conds = log_conditions(**f.model_dump(exclude={"field"}), field=others)
+    return cached_json(request, db, lambda: _values(db, name, prefix, limit, conds))
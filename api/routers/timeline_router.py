@@ -1,27 +1,115 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlalchemy import select, func, and_, case
 from sqlalchemy.orm import Session
-from ..deps import get_db, require_api_key
-from ..models import Log
+from ..deps import get_read_db, require_api_key
+from ..filters import log_conditions, search_filter, ts_bound
+from ..models import Log, RequestSpan, SearchFilter, SpanPage
+from ..pagination import keyset_page
+from ..http_cache import cached_json
+from .. import timeline as span_timeline
+from parser.timestamps import from_epoch_us
 
 router = APIRouter(prefix="/timeline", tags=["timeline"])
 
-@router.get("", summary="Aggregate by tf_req_id")
+_S = 1_000_000
+# Histogram bucket widths (label, microseconds), smallest first
+_BUCKETS = [
+    ("1s", _S), ("2s", 2 * _S), ("5s", 5 * _S), ("10s", 10 * _S), ("15s", 15 * _S), ("30s", 30 * _S),
+    ("1m", 60 * _S), ("2m", 120 * _S), ("5m", 300 * _S), ("10m", 600 * _S), ("15m", 900 * _S),
+    ("30m", 1800 * _S), ("1h", 3600 * _S), ("2h", 7200 * _S), ("3h", 10800 * _S), ("6h", 21600 * _S),
+    ("12h", 43200 * _S), ("1d", 86400 * _S),
+]
+_MAX_BUCKETS = 10_000
+_PAGE = TypeAdapter(SpanPage)
+
+@router.get("", response_model=SpanPage, summary="Aggregate by tf_req_id")
 def timeline(
-    db: Session = Depends(get_db),
+    request: Request,
+    from_ts: str | None = Query(None, description="only requests active at or after this time"),
+    to_ts: str | None = Query(None, description="only requests active at or before this time"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None, description="next/prev value from a previous page"),
+    db: Session = Depends(get_read_db),
+    _: None = Depends(require_api_key),
+):
+    """Start/end/count per tf_req_id for a Gantt/flow view, ordered by start; read from request_spans."""
+    hi = ts_bound(to_ts, "to_ts") if to_ts else None
+    lo = ts_bound(from_ts, "from_ts") if from_ts else None
+
+    def spans():
+        stmt = select(RequestSpan)
+        if hi is not None:
+            stmt = stmt.where(RequestSpan.start_us <= hi)
+        if lo is not None:
+            # Overlap test; the lower start_us bound keeps the scan on the index
+            stmt = stmt.where(RequestSpan.end_us >= lo,
+                              RequestSpan.start_us >= lo - span_timeline.max_span_us(db.connection()))
+        page = keyset_page(db, stmt, [RequestSpan.start_us, RequestSpan.tf_req_id], cursor, limit)
+        page["items"] = [
+            dict(tf_req_id=r.tf_req_id, start=from_epoch_us(r.start_us), end=from_epoch_us(r.end_us),
+                 count=r.count, levels={col[2:].upper(): getattr(r, col)
+                                        for col, _ in span_timeline.LEVEL_COLUMNS if getattr(r, col)})
+            for r in page["items"]
+        ]
+        return page
+    return cached_json(request, db, spans, _PAGE)
+
+def _auto_bucket(span_us: int, target: int) -> tuple[str, int]:
+    """Smallest standard width giving at most `target` buckets; whole days beyond 1d."""
+    for label, width in _BUCKETS:
+        if span_us // width < target:
+            return label, width
+    days = span_us // (target * 86400 * _S) + 1
+    return f"{days}d", days * 86400 * _S
+
+@router.get("/histogram", summary="Counts per level per time bucket")
+def histogram(
+    request: Request,
+    f: SearchFilter = Depends(search_filter),
+    buckets: int = Query(60, ge=1, le=1000, description="target bucket count for auto sizing"),
+    bucket: str | None = Query(None, description="fixed width instead: " + ", ".join(l for l, _ in _BUCKETS)),
+    db: Session = Depends(get_read_db),
     _: None = Depends(require_api_key),
 ):
-    """Return start/end/count per tf_req_id to build a simple Gantt/flow view."""
-    stmt = (
-        select(
-            Log.tf_req_id,
-            func.min(Log.ts).label("start"),
-            func.max(Log.ts).label("end"),
-            func.count().label("count")
-        )
-        .where(Log.tf_req_id.is_not(None))
-        .group_by(Log.tf_req_id)
-        .order_by("start")
-    )
-    items = [dict(tf_req_id=r[0], start=r[1], end=r[2], count=r[3]) for r in db.execute(stmt).all()]
-    return {"items": items}
\ No newline at end of file
+    """Activity chart for the whole run: GROUP BY (ts_us / width, level) over the ts_us index; conditional/cached."""
+    return cached_json(request, db, lambda: _histogram(db, f, buckets, bucket))
+
+def _histogram(db: Session, f: SearchFilter, buckets: int, bucket: str | None) -> dict:
+    conds = log_conditions(**f.model_dump())
+    where = and_(*conds) if conds else True
+    lo = ts_bound(f.from_ts, "from_ts") if f.from_ts else None
+    hi = ts_bound(f.to_ts, "to_ts") if f.to_ts else None
+    if lo is None or hi is None:
+        first, last = db.execute(select(func.min(Log.ts_us), func.max(Log.ts_us)).where(where)).one()
+        lo = first if lo is None else lo
+        hi = last if hi is None else hi
+    if lo is None or hi is None or hi < lo:
+        return {"bucket": None, "bucket_us": None, "from": None, "to": None, "levels": [], "buckets": []}
+
+    if bucket:
+        widths = dict(_BUCKETS)
+        if bucket not in widths:
+            raise HTTPException(400, "Unknown bucket")
+        label, width = bucket, widths[bucket]
+        if (hi - lo) // width >= _MAX_BUCKETS:
+            raise HTTPException(400, "Range too wide for bucket")
+    else:
+        label, width = _auto_bucket(hi - lo, buckets)
+
+    # Floor division like the Python labels below: SQLite's integer division truncates toward zero
+    b = case((Log.ts_us < 0, (Log.ts_us - (width - 1)) // width), else_=Log.ts_us // width).label("b")
+    stmt = select(b, Log.level, func.count()).where(where).group_by(b, Log.level)
+    counts: dict[int, dict[str, int]] = {}
+    levels: set[str] = set()
+    for key, lv, n in db.execute(stmt).all():
+        counts.setdefault(key, {})[lv] = n
+        levels.add(lv)
+
+    out = []
+    for key in range(lo // width, hi // width + 1):
+        c = counts.get(key, {})
+        out.append({"start": from_epoch_us(key * width), "start_us": key * width,
+                    "total": sum(c.values()), "counts": c})
+    return {"bucket": label, "bucket_us": width, "from": from_epoch_us(lo), "to": from_epoch_us(hi),
+            "levels": sorted(levels), "buckets": out}
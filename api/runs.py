@@ -0,0 +1,263 @@
+# Import runs (tables `import_runs`, `run_ranges`).
+# - Every import, job and demo seed is a run: filename, times, status, rows and bytes.
+#   The single writer gives each transaction consecutive log ids, so a run's rows are a
+#   few (lo, hi) ranges instead of a column and an index on every row.
+# - Filtering on a run scans its ts_us span (kept per run) on the time indexes and checks
+#   the id ranges per row, so time-ordered pages of a large run still stop early.
+# - drop() deletes the ranges in RUN_DROP_CHUNK-row transactions, so other writes
+#   interleave with a large drop.
+# - Retention drops the oldest finished runs past RETENTION_DAYS or while the database
+#   holds more than RETENTION_MAX_BYTES; freed pages go back to the filesystem by
+#   incremental vacuum (auto_vacuum=INCREMENTAL, api.db) in VACUUM_STEP_PAGES steps.
+# - Rows imported before runs existed are adopted into one run by install().
+# - `python -m api.runs list|drop ID|retention|vacuum` manages them by hand.
+
+import argparse
+import asyncio
+import json
+import os
+from sqlalchemy import and_, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError, TimeoutError
+from parser.timestamps import from_epoch_us, now_epoch_us
+from . import cache, timeline
+from .db import engine
+from .models import ImportRun, Log, RunRange
+
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "0"))  # drop runs finished longer ago; 0 keeps all
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", "0"))  # used database bytes; 0 = no cap
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))  # seconds between background passes
+RUN_DROP_CHUNK = int(os.getenv("RUN_DROP_CHUNK", "20000"))  # rows deleted per transaction
+VACUUM_STEP_PAGES = int(os.getenv("VACUUM_STEP_PAGES", "2048"))  # pages released per transaction
+
+FINISHED = ("done", "failed", "cancelled")
+_DAY_US = 86_400 * 1_000_000
+_FIELDS = "id, filename, status, started_us, finished_us, records, bytes, first_us, last_us"
+
+
+def install(conn: Connection) -> None:
+    """Adopt rows imported before runs existed into one finished run."""
+    if conn.exec_driver_sql("SELECT 1 FROM import_runs LIMIT 1").scalar() is not None:
+        return
+    lo, hi, count, first, last = conn.exec_driver_sql(
+        "SELECT MIN(id), MAX(id), count(*), MIN(ts_us), MAX(ts_us) FROM logs"
+    ).one()
+    if not count:
+        return
+    now = now_epoch_us()
+    run_id = conn.exec_driver_sql(
+        "INSERT INTO import_runs(filename, status, started_us, finished_us, records, bytes, first_us, last_us) "
+        "VALUES (NULL, 'done', ?, ?, ?, 0, ?, ?)", (now, now, count, first, last)
+    ).lastrowid
+    conn.exec_driver_sql("INSERT INTO run_ranges(run_id, lo, hi) VALUES (?, ?, ?)", (run_id, lo, hi))
+
+
+def start(conn: Connection, filename: str | None) -> int:
+    """New "running" run. Returns its id."""
+    return conn.exec_driver_sql(
+        "INSERT INTO import_runs(filename, status, started_us, records, bytes) VALUES (?, 'running', ?, 0, 0)",
+        (filename, now_epoch_us()),
+    ).lastrowid
+
+
+def add_range(conn: Connection, run_id: int, lo: int, hi: int, first_us: int, last_us: int) -> None:
+    """
+    Record log ids lo..hi (timestamps first_us..last_us) as written by `run_id`,
+    extending its last range when adjacent.
+    """
+    extended = conn.exec_driver_sql(
+        "UPDATE run_ranges SET hi = ? WHERE run_id = ? AND hi = ?", (hi, run_id, lo - 1)
+    ).rowcount
+    if not extended:
+        conn.exec_driver_sql("INSERT INTO run_ranges(run_id, lo, hi) VALUES (?, ?, ?)", (run_id, lo, hi))
+    conn.exec_driver_sql(
+        "UPDATE import_runs SET first_us = MIN(COALESCE(first_us, ?1), ?1), last_us = MAX(COALESCE(last_us, ?2), ?2) "
+        "WHERE id = ?3", (first_us, last_us, run_id)
+    )
+
+
+def finish(conn: Connection, run_id: int, status: str, bytes_read: int) -> None:
+    """Close a run with the rows it actually stored (committed chunks of a failed import count)."""
+    records = conn.exec_driver_sql(
+        "SELECT count(*) FROM run_ranges r JOIN logs l ON l.id BETWEEN r.lo AND r.hi WHERE r.run_id = ?",
+        (run_id,),
+    ).scalar()
+    conn.exec_driver_sql(
+        "UPDATE import_runs SET status = ?, finished_us = ?, records = ?, bytes = ? WHERE id = ?",
+        (status, now_epoch_us(), records, bytes_read, run_id),
+    )
+
+
+def condition(run_id: int):
+    """WHERE clause for the rows of one run: its time span on the ts_us indexes, then its id ranges."""
+    first = select(ImportRun.first_us).where(ImportRun.id == run_id).scalar_subquery()
+    last = select(ImportRun.last_us).where(ImportRun.id == run_id).scalar_subquery()
+    lo = select(func.min(RunRange.lo)).where(RunRange.run_id == run_id).scalar_subquery()
+    hi = select(func.max(RunRange.hi)).where(RunRange.run_id == run_id).scalar_subquery()
+    # Runs imported concurrently interleave; the probe skips ids of the other run in between
+    inside = select(RunRange.lo).where(RunRange.run_id == run_id, Log.id.between(RunRange.lo, RunRange.hi))
+    # `id + 0`: a rowid range would win the plan and sort every row of a large run
+    return and_(Log.ts_us.between(first, last), (Log.id + 0).between(lo, hi), inside.exists())
+
+
+def _out(row) -> dict:
+    run_id, filename, status, started_us, finished_us, records, bytes_read, first_us, last_us = row
+    return {"id": run_id, "filename": filename, "status": status, "started": from_epoch_us(started_us),
+            "finished": from_epoch_us(finished_us), "records": records, "bytes": bytes_read,
+            "first": from_epoch_us(first_us), "last": from_epoch_us(last_us)}
+
+
+def list_runs(conn: Connection) -> list[dict]:
+    """Every run, newest first."""
+    return [_out(r) for r in conn.exec_driver_sql(f"SELECT {_FIELDS} FROM import_runs ORDER BY id DESC")]
+
+
+def get(conn: Connection, run_id: int) -> dict | None:
+    row = conn.exec_driver_sql(f"SELECT {_FIELDS} FROM import_runs WHERE id = ?", (run_id,)).first()
+    return _out(row) if row is not None else None
+
+
+def _delete_ids(conn: Connection, lo: int, hi: int) -> int:
+    # `bodies` has no delete trigger on logs; deleting its rows releases the blob refcounts
+    conn.exec_driver_sql("DELETE FROM bodies WHERE log_id BETWEEN ? AND ?", (lo, hi))
+    conn.exec_driver_sql("DELETE FROM log_fields WHERE log_id BETWEEN ? AND ?", (lo, hi))
+    # logs_ad removes the FTS entries and payloads
+    return conn.exec_driver_sql("DELETE FROM logs WHERE id BETWEEN ? AND ?", (lo, hi)).rowcount
+
+
+def _in(values: tuple[str, ...]) -> str:
+    return f"({', '.join('?' * len(values))})"
+
+
+def drop(run_id: int, chunk: int = RUN_DROP_CHUNK, statuses: tuple[str, ...] = FINISHED) -> int | None:
+    """
+    Delete a run and its rows, `chunk` ids per transaction. Returns rows deleted, or None
+    when the run is missing or its status is not in `statuses` (still importing, being dropped).
+    """
+    chunk = max(1, chunk)
+    with engine.begin() as conn:
+        claimed = conn.exec_driver_sql(
+            f"UPDATE import_runs SET status = 'deleting' WHERE id = ? AND status IN {_in(statuses)}",
+            (run_id, *statuses),
+        ).rowcount
+        if not claimed:
+            return None
+        # Queued FTS ranges must not outlive their rows
+        conn.exec_driver_sql("""
+            DELETE FROM fts_pending WHERE EXISTS (
+              SELECT 1 FROM run_ranges r WHERE r.run_id = ? AND fts_pending.lo >= r.lo AND fts_pending.hi <= r.hi)
+        """, (run_id,))
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            row = conn.exec_driver_sql(
+                "SELECT lo, hi FROM run_ranges WHERE run_id = ? ORDER BY lo LIMIT 1", (run_id,)
+            ).first()
+            if row is None:
+                conn.exec_driver_sql("DELETE FROM import_runs WHERE id = ?", (run_id,))
+                timeline.rebuild(conn)  # spans are not decremented on delete
+                cache.bump(conn)
+                return deleted
+            lo, hi = row
+            end = min(hi, lo + chunk - 1)
+            deleted += _delete_ids(conn, lo, end)
+            if end == hi:
+                conn.exec_driver_sql("DELETE FROM run_ranges WHERE run_id = ? AND lo = ?", (run_id, lo))
+            else:
+                conn.exec_driver_sql("UPDATE run_ranges SET lo = ? WHERE run_id = ? AND lo = ?", (end + 1, run_id, lo))
+            cache.bump(conn)
+
+
+def used_bytes(conn: Connection) -> int:
+    """Bytes in use by the database (free pages not counted)."""
+    pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+    free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return (pages - free) * conn.exec_driver_sql("PRAGMA page_size").scalar()
+
+
+def vacuum(pages: int = VACUUM_STEP_PAGES) -> int:
+    """Give free pages back to the filesystem, `pages` per step. Returns pages released."""
+    released = 0
+    while True:
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                return released  # NONE/FULL: nothing to do incrementally
+            free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if not free:
+                return released
+            # execute() steps the pragma once (one page); a script runs it to completion
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({min(free, pages)});")
+            left = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        if left >= free:
+            return released
+        released += free - left
+
+
+def _finished_ids(conn: Connection, before_us: int | None = None) -> list[int]:
+    """Finished runs, oldest first; only those finished before `before_us` if given."""
+    sql = f"SELECT id FROM import_runs WHERE status IN {_in(FINISHED)}"
+    params: tuple = FINISHED
+    if before_us is not None:
+        sql += " AND COALESCE(finished_us, started_us) < ?"
+        params += (before_us,)
+    return [r for r, in conn.exec_driver_sql(sql + " ORDER BY id", params)]
+
+
+def apply_retention(days: float = RETENTION_DAYS, max_bytes: int = RETENTION_MAX_BYTES) -> list[int]:
+    """
+    Drop finished runs older than `days`, then the oldest ones while more than
+    `max_bytes` are in use (the newest finished run is always kept). Returns dropped ids.
+    """
+    dropped = []
+    if days > 0:
+        with engine.connect() as conn:
+            old = _finished_ids(conn, now_epoch_us() - int(days * _DAY_US))
+        dropped += [run_id for run_id in old if drop(run_id) is not None]
+    while max_bytes > 0:
+        with engine.connect() as conn:
+            candidates = _finished_ids(conn)[:-1] if used_bytes(conn) > max_bytes else []
+        if not candidates or drop(candidates[0]) is None:
+            break
+        dropped.append(candidates[0])
+    return dropped
+
+
+async def background_retention(interval: float = RETENTION_INTERVAL) -> None:
+    """Apply the retention policy every `interval` seconds and release the freed pages."""
+    def _run():
+        apply_retention()
+        vacuum()
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_run)
+        except (OperationalError, TimeoutError):
+            continue  # the writer stayed busy; retry on the next tick
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m api.runs", description="List, drop or expire import runs.")
+    ap.add_argument("command", choices=["list", "drop", "retention", "vacuum"])
+    ap.add_argument("run_id", nargs="?", type=int, help="run to drop")
+    args = ap.parse_args(argv)
+    from .db import init_db
+    init_db()
+    if args.command == "list":
+        with engine.connect() as conn:
+            out = list_runs(conn)
+    elif args.command == "drop":
+        if args.run_id is None:
+            ap.error("drop needs a run id")
+        # Any status: also finishes a drop that was interrupted, or removes a run left "running" by a crash
+        statuses = (*FINISHED, "running", "deleting")
+        out = {"deleted": drop(args.run_id, statuses=statuses), "vacuumed_pages": vacuum()}
+    elif args.command == "retention":
+        out = {"dropped": apply_retention(), "vacuumed_pages": vacuum()}
+    else:
+        out = {"vacuumed_pages": vacuum()}
+    print(json.dumps(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Per-tf_req_id summary behind /timeline (table `request_spans`).
+# - Imports call refresh() before each commit: it aggregates only the log ids added
+#   since the last refresh (watermark in `timeline_state`) and upserts them, so the
+#   cost follows the import size, not the table size.
+# - `max_span_us` (longest start..end seen) lets window queries bound start_us
+#   from below and stay on the (start_us, tf_req_id) index.
+# - Rows removed from `logs` are not subtracted; run rebuild() after deletes.
+# - `python -m api.timeline check|refresh|rebuild` verifies or repairs the table.
+
+import argparse
+import json
+from sqlalchemy.engine import Connection
+from .db import engine
+
+# (column, levels counted in it); other levels only add to `count`
+LEVEL_COLUMNS = (
+    ("n_trace", ("TRACE",)),
+    ("n_debug", ("DEBUG",)),
+    ("n_info", ("INFO",)),
+    ("n_warn", ("WARN", "WARNING")),
+    ("n_error", ("ERROR",)),
+)
+
+_COLS = ", ".join(c for c, _ in LEVEL_COLUMNS)
+_SUMS = ", ".join(
+    f"SUM(level IN ({', '.join(repr(l) for l in levels)}))" for _, levels in LEVEL_COLUMNS
+)
+_ADDS = ", ".join(f"{c} = {c} + excluded.{c}" for c, _ in LEVEL_COLUMNS)
+
+_UPSERT = f"""
+INSERT INTO request_spans (tf_req_id, start_us, end_us, count, {_COLS})
+SELECT tf_req_id, MIN(ts_us), MAX(ts_us), COUNT(*), {_SUMS}
+  FROM logs
+ WHERE id > ? AND id <= ? AND tf_req_id IS NOT NULL AND ts_us IS NOT NULL
+ GROUP BY tf_req_id
+ON CONFLICT (tf_req_id) DO UPDATE SET
+  start_us = MIN(start_us, excluded.start_us),
+  end_us = MAX(end_us, excluded.end_us),
+  count = count + excluded.count,
+  {_ADDS}
+"""
+
+
+def _last_id(conn: Connection) -> int:
+    return conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM logs").scalar()
+
+
+def install(conn: Connection) -> None:
+    """Create the watermark table; a fresh install summarizes existing logs."""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS timeline_state (last_id INTEGER NOT NULL, max_span_us INTEGER NOT NULL)"
+    )
+    if conn.exec_driver_sql("SELECT count(*) FROM timeline_state").scalar() == 0:
+        conn.exec_driver_sql("INSERT INTO timeline_state(last_id, max_span_us) VALUES (0, 0)")
+        rebuild(conn)
+
+
+def refresh(conn: Connection) -> int:
+    """Fold logs added since the last call into `request_spans`. Returns ids covered."""
+    after, span = conn.exec_driver_sql("SELECT last_id, max_span_us FROM timeline_state").one()
+    hi = _last_id(conn)
+    if hi < after:
+        return rebuild(conn)  # the newest rows were deleted; the watermark is meaningless
+    if hi == after:
+        return 0
+    conn.exec_driver_sql(_UPSERT, (after, hi))
+    touched = conn.exec_driver_sql("""
+        SELECT MAX(end_us - start_us) FROM request_spans
+         WHERE tf_req_id IN (SELECT tf_req_id FROM logs WHERE id > ? AND id <= ?)
+    """, (after, hi)).scalar()
+    conn.exec_driver_sql(
+        "UPDATE timeline_state SET last_id = ?, max_span_us = ?", (hi, max(span, touched or 0))
+    )
+    return hi - after
+
+
+def rebuild(conn: Connection) -> int:
+    """Recompute every span from `logs`. Returns ids covered."""
+    conn.exec_driver_sql("DELETE FROM request_spans")
+    conn.exec_driver_sql("UPDATE timeline_state SET last_id = 0, max_span_us = 0")
+    return refresh(conn)
+
+
+def max_span_us(conn: Connection) -> int:
+    return conn.exec_driver_sql("SELECT max_span_us FROM timeline_state").scalar() or 0
+
+
+def check(conn: Connection) -> dict:
+    """Compare `request_spans` with a full GROUP BY over `logs`; `ok` is False when a rebuild is needed."""
+    last_id = conn.exec_driver_sql("SELECT last_id FROM timeline_state").scalar()
+    cols = "tf_req_id, start_us, end_us, count"
+    mismatched = conn.exec_driver_sql(f"""
+        WITH fresh AS (
+          SELECT tf_req_id, MIN(ts_us) AS start_us, MAX(ts_us) AS end_us, COUNT(*) AS count
+            FROM logs
+           WHERE id <= ? AND tf_req_id IS NOT NULL AND ts_us IS NOT NULL
+           GROUP BY tf_req_id
+        )
+        SELECT (SELECT count(*) FROM (SELECT * FROM fresh EXCEPT SELECT {cols} FROM request_spans))
+             + (SELECT count(*) FROM (SELECT {cols} FROM request_spans EXCEPT SELECT * FROM fresh))
+    """, (last_id,)).scalar()
+    return {
+        "spans": conn.exec_driver_sql("SELECT count(*) FROM request_spans").scalar(),
+        "last_id": last_id,
+        "pending": _last_id(conn) - last_id,
+        "mismatched": mismatched,
+        "ok": mismatched == 0,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m api.timeline", description="Check or repair request_spans.")
+    ap.add_argument("command", choices=["check", "refresh", "rebuild"])
+    args = ap.parse_args(argv)
+    from .db import init_db
+    init_db()
+    with engine.begin() as conn:
+        if args.command == "check":
+            out = check(conn)
+        elif args.command == "refresh":
+            out = {"refreshed": refresh(conn)}
+        else:
+            out = {"rebuilt": rebuild(conn)}
+    print(json.dumps(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Read latency while an import is writing.
+# Run: python -m bench.concurrency [--rows N] [--write-rows N] [--readers N]
+# Compare journal modes with e.g. SQLITE_JOURNAL_MODE=DELETE python -m bench.concurrency
+# Builds a scratch database from the synthetic corpus; reads go through the
+# read-only pool, the import through the single writer connection.
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(s[min(len(s) - 1, int(p * len(s)))] * 1000, 2)
+    return {"n": len(s), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "max_ms": round(s[-1] * 1000, 2)}
+
+
+def main(argv: list[str] | None = None) -> dict:
+    ap = argparse.ArgumentParser(prog="python -m bench.concurrency")
+    ap.add_argument("--rows", type=int, default=100_000, help="rows present before the import")
+    ap.add_argument("--write-rows", type=int, default=200_000, help="rows imported under read load")
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--think-ms", type=float, default=20.0, help="pause between reads per reader")
+    ap.add_argument("--idle-seconds", type=float, default=3.0)
+    args = ap.parse_args(argv)
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "concurrency.db")
+    from sqlalchemy import select, and_
+    from api.db import SessionLocal, ReadSession, init_db, SQLITE_JOURNAL_MODE
+    from api.filters import log_conditions
+    from api.models import Log
+    from parser.main import import_file_like
+    from .corpus import generate
+    init_db()
+
+    def ndjson(n: int, seed: int) -> bytes:
+        return "".join(json.dumps(r) + "\n" for r in generate(n, seed=seed)).encode()
+
+    def load(data: bytes) -> int:
+        with SessionLocal() as db:
+            return asyncio.run(import_file_like(io.BytesIO(data), db, stream=True, writer="bulk",
+                                                fts_index="trigger", workers=0))
+
+    load(ndjson(args.rows, 1))
+    payload = ndjson(args.write_rows, 2)
+    with ReadSession() as db:
+        lo, hi = db.execute(select(Log.ts_us).order_by(Log.ts_us).limit(1)).scalar(), \
+            db.execute(select(Log.ts_us).order_by(Log.ts_us.desc()).limit(1)).scalar()
+
+    def one_read(db, rnd: random.Random) -> None:
+        kind = rnd.randrange(3)
+        if kind == 0:  # /logs cursor page
+            stmt = select(Log).where(Log.id > rnd.randrange(args.rows)).order_by(Log.id).limit(50)
+        elif kind == 1:  # /search level + time window
+            start = rnd.randrange(lo, hi)
+            stmt = select(Log).where(and_(Log.level == "ERROR", Log.ts_us >= start)) \
+                .order_by(Log.ts_us, Log.id).limit(50)
+        else:  # /search full text
+            stmt = select(Log).where(and_(*log_conditions(q=rnd.choice(("apply", "schema", "provider")))))\
+                .order_by(Log.ts_us, Log.id).limit(50)
+        db.execute(stmt).scalars().all()
+
+    def reader(stop: threading.Event, out: list, errors: list, seed: int) -> None:
+        rnd = random.Random(seed)
+        with ReadSession() as db:
+            while not stop.is_set():
+                t = time.perf_counter()
+                try:
+                    one_read(db, rnd)
+                except Exception as e:  # e.g. "database is locked" in rollback-journal mode
+                    errors.append(type(e).__name__)
+                    db.rollback()
+                    continue
+                out.append(time.perf_counter() - t)
+                stop.wait(args.think_ms / 1000)
+
+    def run_readers(during) -> tuple[list, list, object]:
+        stop, samples, errors = threading.Event(), [], []
+        threads = [threading.Thread(target=reader, args=(stop, samples, errors, i)) for i in range(args.readers)]
+        for th in threads:
+            th.start()
+        result = during()
+        stop.set()
+        for th in threads:
+            th.join()
+        return samples, errors, result
+
+    idle, idle_err, _ = run_readers(lambda: time.sleep(args.idle_seconds))
+    t = time.perf_counter()
+    busy, busy_err, written = run_readers(lambda: load(payload))
+    elapsed = time.perf_counter() - t
+
+    out = {
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "readers": args.readers,
+        "think_ms": args.think_ms,
+        "idle": _percentiles(idle) | {"errors": len(idle_err)},
+        "under_write": _percentiles(busy) | {"errors": len(busy_err)},
+        "write_rows_per_s": round(written / elapsed),
+    }
+    print(json.dumps(out))
+    return out
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Deterministic synthetic tflog corpus for benchmarks.
+# Records mimic `TF_LOG=json` output: @level/@message/@timestamp/@module plus
+# provider keys (tf_req_id, tf_rpc, tf_provider_addr, ...) and optional HTTP bodies.
+# Write a file with: python -m bench.corpus OUT [--rows N] [--form ndjson|array] [...]
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+_LEVELS = ("trace", "debug", "debug", "info", "info", "info", "warn", "error")
+_RPCS = ("GetProviderSchema", "ValidateResourceConfig", "PlanResourceChange",
+         "ApplyResourceChange", "ReadResource", "ConfigureProvider")
+_PROVIDERS = ("registry.terraform.io/hashicorp/aws", "registry.terraform.io/hashicorp/google",
+              "registry.terraform.io/hashicorp/azurerm")
+_RESOURCES = ("aws_instance", "aws_s3_bucket", "aws_iam_role", "google_compute_instance",
+              "azurerm_resource_group", "aws_security_group")
+_MODULES = ("provider.terraform-provider-aws", "sdk.proto", "sdk.helper_schema", "terraform")
+_WORDS = ("provider", "request", "response", "resource", "schema", "calling", "received",
+          "state", "diff", "config", "attribute", "value", "planned", "apply", "read")
+
+
+def generate(n: int, seed: int = 42, body_ratio: float = 0.3, secret_ratio: float = 0.05,
+             req_ids: int = 500, body_items: int = 6) -> Iterator[dict]:
+    """
+    Yield `n` tflog-like records; same arguments give the same records.
+    `body_ratio` is the chance of a request and (independently) a response body,
+    `body_items` the most items in a response body (~90 bytes each), `secret_ratio`
+    the chance of an Authorization header (and of a token in a request body),
+    `req_ids` the number of distinct tf_req_id prefixes.
+    """
+    rnd = random.Random(seed)
+    t0 = datetime(2025, 10, 1, 6, 0, 0, tzinfo=timezone.utc)
+    for i in range(n):
+        ts = t0 + timedelta(microseconds=i * 1500 + rnd.randrange(1000))
+        rec = {
+            "@level": rnd.choice(_LEVELS),
+            "@message": " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(3, 12))),
+            "@module": rnd.choice(_MODULES),
+            "@timestamp": ts.isoformat(timespec="microseconds"),
+        }
+        if rnd.random() < 0.7:
+            rec["tf_req_id"] = f"{rnd.randrange(req_ids):08x}-2f1c-4c77-9b1e-{i % 997:012x}"
+            rec["tf_rpc"] = rnd.choice(_RPCS)
+            rec["tf_provider_addr"] = rnd.choice(_PROVIDERS)
+            rec["tf_resource_type"] = rnd.choice(_RESOURCES)
+            rec["@caller"] = f"github.com/hashicorp/terraform-plugin-go/tfprotov5/internal/tf5serverlogging/server.go:{rnd.randrange(20, 400)}"
+        if rnd.random() < secret_ratio:
+            rec["Authorization"] = "Bearer " + "".join(rnd.choice("abcdef0123456789") for _ in range(40))
+        if rnd.random() < body_ratio:
+            rec["tf_http_req_body"] = {
+                "Action": rnd.choice(("DescribeInstances", "GetBucketPolicy", "GetRole")),
+                "Version": "2016-11-15",
+                "Filter": [{"Name": "tag:env", "Value": [rnd.choice(("prod", "dev", "stage"))]}],
+            }
+            if rnd.random() < secret_ratio * 4:
+                rec["tf_http_req_body"]["session_token"] = "".join(rnd.choice("ABCDEFabcdef0123456789") for _ in range(32))
+        if rnd.random() < body_ratio:
+            rec["tf_http_res_body"] = {
+                "requestId": f"{rnd.getrandbits(64):016x}",
+                "items": [{"id": f"i-{rnd.getrandbits(32):08x}", "state": "running",
+                           "tags": {"Name": rnd.choice(_WORDS)}} for _ in range(rnd.randint(1, max(1, body_items)))],
+            }
+        yield rec
+
+
+def encode(records: Iterable[dict], form: str = "ndjson") -> bytes:
+    """File contents in either import format: one object per line, or one JSON array."""
+    if form == "array":
+        return ("[" + ",\n".join(json.dumps(r) for r in records) + "]").encode()
+    return "".join(json.dumps(r) + "\n" for r in records).encode()
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    """Corpus options shared by the bench scripts; pass the parsed values to corpus_kwargs()."""
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--body-ratio", type=float, default=0.3, help="chance of a request / response body")
+    ap.add_argument("--body-items", type=int, default=6, help="max items per response body (~90 bytes each)")
+    ap.add_argument("--secret-ratio", type=float, default=0.05, help="chance of a credential in a record")
+    ap.add_argument("--req-ids", type=int, default=500, help="distinct tf_req_id prefixes")
+    ap.add_argument("--form", choices=["ndjson", "array"], default="ndjson")
+
+
+def corpus_kwargs(args: argparse.Namespace) -> dict:
+    return dict(seed=args.seed, body_ratio=args.body_ratio, secret_ratio=args.secret_ratio,
+                req_ids=args.req_ids, body_items=args.body_items)
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.corpus", description="Write a synthetic tflog file.")
+    ap.add_argument("out")
+    add_arguments(ap)
+    args = ap.parse_args(argv)
+    data = encode(generate(args.rows, **corpus_kwargs(args)), args.form)
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(json.dumps({"out": args.out, "rows": args.rows, "bytes": len(data), "form": args.form}))
+
+
+if __name__ == "__main__":
+    main()
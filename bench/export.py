@@ -0,0 +1,71 @@
+# Export throughput: GET /export variants vs the old ORM-per-row generator.
+# Run: python -m bench.export [--rows N] [--db PATH]
+# Builds a scratch database from the synthetic corpus unless --db points at one.
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def _legacy(db):
+    """The previous export loop: full ORM objects, one json.dumps per row."""
+    from sqlalchemy import select
+    from api.models import Log
+    for row in db.execute(select(Log).order_by(Log.id)).scalars():
+        yield json.dumps({
+            "id": row.id, "ts": row.ts, "level": row.level, "section": row.section,
+            "tf_req_id": row.tf_req_id, "summary": row.summary
+        }) + "\n"
+
+
+def main(argv: list[str] | None = None) -> dict:
+    ap = argparse.ArgumentParser(prog="python -m bench.export")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--db", help="existing database to export from")
+    args = ap.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "export.db")
+    os.environ["DB_PATH"] = path
+    os.environ.setdefault("RATE_LIMIT", str(1 << 30))
+    from fastapi.testclient import TestClient
+    from api.db import SessionLocal, init_db
+    from api.main import app
+    init_db()
+
+    if not args.db:
+        import asyncio
+        import io
+        from parser.main import import_file_like
+        from .corpus import generate
+        data = "".join(json.dumps(r) + "\n" for r in generate(args.rows)).encode()
+        with SessionLocal() as db:
+            asyncio.run(import_file_like(io.BytesIO(data), db, stream=True, writer="bulk",
+                                         fts_index="deferred", workers=0))
+
+    client = TestClient(app)
+    headers = {"X-API-Key": os.getenv("API_KEY", "dev-key-123")}
+    with SessionLocal() as db:
+        t = time.perf_counter()
+        rows = sum(1 for _ in _legacy(db))
+        out = {"rows": rows, "legacy_rows_per_s": round(rows / (time.perf_counter() - t))}
+
+    variants = {
+        "ndjson": {},
+        "ndjson_gzip": {"gzip": True},
+        "csv": {"format": "csv"},
+        "ndjson_raw_bodies": {"raw": True, "bodies": True},
+    }
+    for name, params in variants.items():
+        t = time.perf_counter()
+        with client.stream("GET", "/export", params=params, headers=headers) as r:
+            size = sum(len(c) for c in r.iter_raw())
+        out[f"{name}_rows_per_s"] = round(rows / (time.perf_counter() - t))
+        out[f"{name}_bytes"] = size
+    print(json.dumps(out))
+    return out
+
+
+if __name__ == "__main__":
+    main()
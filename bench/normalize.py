@@ -0,0 +1,73 @@
+# Micro-benchmark: single-pass parser.main._build_row vs the per-field helpers.
+# Run: python -m bench.normalize [--rows N]
+
+import argparse
+import json
+import time
+from api import fields
+from parser import main as pm
+from parser.security_sanitizer import sanitize_dict
+from parser.timestamps import to_epoch_us
+from .corpus import generate
+
+
+def legacy_row(rec: dict):
+    """Row mapping as done field by field with the individual helpers."""
+    clean = sanitize_dict(rec)
+    req, res = pm._extract_bodies(clean)
+    ts = pm._iso(pm._first(rec, "timestamp", "ts", "@timestamp"))
+    row = dict(
+        ts=ts,
+        ts_us=to_epoch_us(ts),
+        level=pm._level(rec),
+        section=pm._section(rec),
+        tf_req_id=pm._req_id(rec),
+        summary=pm._summary(rec),
+        has_req_body=bool(req),
+        has_res_body=bool(res),
+        is_read=False,
+        raw_json=json.dumps(clean, ensure_ascii=False),
+        fields=fields.extract(clean),
+    )
+    bodies = None
+    if req is not None or res is not None:
+        bodies = (
+            json.dumps(req, ensure_ascii=False) if req is not None else None,
+            json.dumps(res, ensure_ascii=False) if res is not None else None,
+        )
+    return row, bodies
+
+
+def _time(fn, records) -> float:
+    t = time.perf_counter()
+    for rec in records:
+        fn(rec)
+    return time.perf_counter() - t
+
+
+def main(argv: list[str] | None = None) -> dict:
+    ap = argparse.ArgumentParser(prog="python -m bench.normalize")
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    records = list(generate(args.rows))
+    # Also cover the text fallbacks (no level / no message keys)
+    records += [{k: v for k, v in r.items() if k not in ("@level", "@message")} for r in records[:1000]]
+    for rec in records:
+        assert pm._build_row(rec) == legacy_row(rec), rec
+
+    legacy = min(_time(legacy_row, records) for _ in range(args.repeat))
+    single = min(_time(pm._build_row, records) for _ in range(args.repeat))
+    out = {
+        "rows": len(records),
+        "legacy_rows_per_s": round(len(records) / legacy),
+        "single_pass_rows_per_s": round(len(records) / single),
+        "speedup": round(legacy / single, 2),
+    }
+    print(json.dumps(out))
+    return out
+
+
+if __name__ == "__main__":
+    main()
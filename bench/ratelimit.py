@@ -0,0 +1,84 @@
+# Rate limiter overhead: api.ratelimit token buckets vs the old per-key timestamp lists.
+# Run: python -m bench.ratelimit [--limit N] [--requests N] [--clients N]
+# Pure in-process checks with a fake clock (no HTTP), so only the limiter is measured.
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+
+
+class _Legacy:
+    """The previous middleware body: a list of timestamps per key, trimmed with pop(0)."""
+
+    def __init__(self, limit: int, window: float, clock):
+        self.limit, self.window, self.clock = limit, window, clock
+        self.buckets: dict[str, list[float]] = defaultdict(list)
+
+    def check(self, key: str, cost: float = 1.0) -> float:
+        now = self.clock()
+        bucket = self.buckets[key]
+        cutoff = now - self.window
+        while bucket and bucket[0] < cutoff:
+            bucket.pop(0)
+        if len(bucket) >= self.limit:
+            return 1.0
+        bucket.append(now)
+        return 0.0
+
+
+def _run(make, keys) -> dict:
+    """Time `check` over `keys` (fake clock, 1 ms per request), then measure retained memory on a second pass."""
+    clock = _Clock()
+    limiter = make(clock)
+    t = time.perf_counter()
+    for key in keys:
+        limiter.check(key)
+        clock.now += 0.001
+    elapsed = time.perf_counter() - t
+
+    clock = _Clock()
+    tracemalloc.start()
+    limiter = make(clock)
+    for key in keys:
+        limiter.check(key)
+        clock.now += 0.001
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    keys_held = len(limiter.buckets) if isinstance(limiter, _Legacy) else limiter.stats()["keys"]
+    return {"us_per_check": round(elapsed / len(keys) * 1e6, 3), "retained_kib": mem // 1024, "keys": keys_held}
+
+
+class _Clock:
+    now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def main(argv: list[str] | None = None) -> dict:
+    ap = argparse.ArgumentParser(prog="python -m bench.ratelimit")
+    ap.add_argument("--limit", type=int, default=5000, help="requests per window (RATE_LIMIT)")
+    ap.add_argument("--window", type=float, default=60.0)
+    ap.add_argument("--requests", type=int, default=200_000)
+    ap.add_argument("--clients", type=int, default=100_000, help="distinct keys in the rotating-client run")
+    args = ap.parse_args(argv)
+    from api.ratelimit import TokenBucketLimiter
+
+    scenarios = {
+        # one busy key holding a full window of timestamps
+        "hot_key": ["k"] * args.requests,
+        # every request from a new client (e.g. rotating IPs)
+        "rotating_clients": [f"ip:{i % args.clients}" for i in range(args.requests)],
+    }
+    out = {"limit": args.limit, "requests": args.requests, "clients": args.clients}
+    for name, keys in scenarios.items():
+        out[f"{name}_legacy"] = _run(lambda c: _Legacy(args.limit, args.window, c), keys)
+        out[f"{name}_token_bucket"] = _run(lambda c: TokenBucketLimiter(args.limit, args.window, clock=c), keys)
+    print(json.dumps(out))
+    return out
+
+
+if __name__ == "__main__":
+    main()
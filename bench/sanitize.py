@@ -0,0 +1,88 @@
+# Differential check + throughput for parser.security_sanitizer.sanitize_dict.
+# The reference below is the original copy-everything implementation; the fast
+# engine must produce byte-identical JSON for every record.
+# Run: python -m bench.sanitize [--rows N]
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Any
+from parser.security_sanitizer import sanitize_dict
+from .corpus import generate
+
+_SECRET_KEYS = re.compile(r"(password|passwd|secret|token|authorization|x-api-key|bearer)", re.I)
+_JWT = re.compile(r"^[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+$")
+_LONG_HEX_B64 = re.compile(r"([A-Fa-f0-9]{20,}|[A-Za-z0-9+/]{24,}={0,2})")
+
+
+def reference(d: Any) -> Any:
+    if isinstance(d, dict):
+        out = {}
+        for k, v in d.items():
+            if _SECRET_KEYS.search(str(k)):
+                out[k] = "[REDACTED]"
+            else:
+                out[k] = reference(v)
+        return out
+    if isinstance(d, list):
+        return [reference(x) for x in d]
+    if isinstance(d, str):
+        if _JWT.match(d) or _LONG_HEX_B64.search(d):
+            return "[REDACTED]"
+        return d
+    return d
+
+
+def edge_cases(seed: int = 7, n: int = 20_000) -> list:
+    """Strings around the pattern thresholds, odd key types and nesting."""
+    rnd = random.Random(seed)
+    alphabet = "abcdefABCDEF0123456789+/=.-_:;@[]^ \n\tzZé"
+    cases: list = [
+        "", "a", "a.b", "a.b.c", "a.b.c\n", "a..b", ".a.b", "a.b.c.d", "[.]._", "@.^.\\",
+        "0" * 19, "0" * 20, "g" * 23, "g" * 24, "g" * 24 + "==", "ab" * 12, "x y " * 20,
+        {"Password": 1, "TOKEN_x": None, "nested": {"x-api-key": [1, 2]}},
+        {1: "a", None: "c", 2.5: "0" * 30},
+        {True: "b", False: "0" * 30},  # True == 1: a separate dict, or it collapses into the key above
+        [[[]], {}, [{"k": ["0" * 25]}]], 3, 2.5, None, True,
+    ]
+    for _ in range(n):
+        s = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 40)))
+        cases.append(s)
+        cases.append({s: s, "k": [s, {"bearer": s}]})
+    return cases
+
+
+def _time(fn, records) -> float:
+    t = time.perf_counter()
+    for rec in records:
+        fn(rec)
+    return time.perf_counter() - t
+
+
+def main(argv: list[str] | None = None) -> dict:
+    ap = argparse.ArgumentParser(prog="python -m bench.sanitize")
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    records = list(generate(args.rows))
+    for rec in records + edge_cases():
+        expected = json.dumps(reference(rec), ensure_ascii=False)
+        assert json.dumps(sanitize_dict(rec), ensure_ascii=False) == expected, rec
+
+    ref = min(_time(reference, records) for _ in range(args.repeat))
+    fast = min(_time(sanitize_dict, records) for _ in range(args.repeat))
+    out = {
+        "rows": len(records),
+        "reference_rows_per_s": round(len(records) / ref),
+        "fast_rows_per_s": round(len(records) / fast),
+        "speedup": round(ref / fast, 2),
+    }
+    print(json.dumps(out))
+    return out
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# Benchmark suite: one synthetic corpus through every hot path, with results comparable across commits.
+# Run: python -m bench.suite [--rows N] [corpus options] [--only search,export] [--out results.json]
+#      [--baseline old.json] [--threshold 0.25] [--metric-threshold search.rare_term.p50_ms=0.5]
+# - In-process against a scratch database; HTTP scenarios go through TestClient with the
+#   response cache off, so every request runs its query.
+# - The import always runs (it loads the database the other scenarios read).
+# - Metrics are flat "scenario.name" keys: *_per_s is higher-is-better, *_ms lower-is-better.
+# - With --baseline (a previous --out file from the same corpus options), a metric worse by
+#   more than its threshold is listed under "regressions" and the exit status is 1.
+#   Latencies must also be worse by at least --min-ms, so sub-millisecond noise never fails;
+#   p95s are reported but only gated when named with --metric-threshold (20 samples are noisy).
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from .corpus import add_arguments, corpus_kwargs, encode, generate
+
+SCENARIOS = ("sanitize", "search", "timeline", "export", "mark_read")
+
+
+def _latency(fn, repeat: int) -> dict:
+    """p50/p95 of `repeat` calls in ms (after one warm-up call)."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    pick = lambda p: round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95)}
+
+
+def _flat(prefix: str, values: dict, out: dict) -> None:
+    for k, v in values.items():
+        out[f"{prefix}.{k}"] = v
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _probes(records: list[dict]) -> dict:
+    """Filter values that exist in the corpus: a busy tf_req_id, a one-record term, a time window."""
+    req_id = Counter(r["tf_req_id"] for r in records if "tf_req_id" in r).most_common(1)
+    rare = next((r["tf_http_res_body"]["items"][0]["id"].split("-")[1]
+                 for r in records if "tf_http_res_body" in r), "zzzz")
+    n = len(records)
+    return {
+        "req_id": req_id[0][0] if req_id else None,
+        "rare": rare,
+        "from_ts": records[n // 2]["@timestamp"],
+        "to_ts": records[min(n - 1, n // 2 + n // 10)]["@timestamp"],
+    }
+
+
+def run_sanitize(records: list[dict]) -> dict:
+    from parser.security_sanitizer import sanitize_dict
+    best = float("inf")
+    for _ in range(3):
+        t = time.perf_counter()
+        for rec in records:
+            sanitize_dict(rec)
+        best = min(best, time.perf_counter() - t)
+    return {"rows_per_s": round(len(records) / best)}
+
+
+def run_import(data: bytes, rows: int) -> dict:
+    from api.db import SessionLocal
+    from parser.main import import_file_like
+    t = time.perf_counter()
+    with SessionLocal() as db:
+        imported = asyncio.run(import_file_like(io.BytesIO(data), db, stream=True, writer="bulk",
+                                                fts_index="deferred", workers=0))
+    elapsed = time.perf_counter() - t
+    assert imported == rows, (imported, rows)
+    return {"rows_per_s": round(rows / elapsed), "mb_per_s": round(len(data) / elapsed / 1e6, 2)}
+
+
+def run_search(get, probes: dict, rows: int, repeat: int) -> dict:
+    from api import cache
+    queries = {
+        "first_page": {},
+        "level": {"level": "ERROR"},
+        "req_id": {"tf_req_id": probes["req_id"]},
+        "time_window": {"from_ts": probes["from_ts"], "to_ts": probes["to_ts"]},
+        "field": {"field": "tf_rpc:ReadResource"},
+        "common_term": {"q": "provider"},
+        "rare_term": {"q": probes["rare"]},
+        "term_and_level": {"q": "schema", "level": "WARN"},
+        "prefix_term": {"q": "resp*"},
+        "ranked": {"q": "DescribeInstances", "order": "rank"},
+        "deep_offset": {"offset": rows // 2},
+    }
+    out = {}
+    for name, params in queries.items():
+        _flat(name, _latency(lambda: get("/search", params), repeat), out)
+
+    def facets():
+        cache.facets.clear()
+        get("/search/facets", {"level": "ERROR"})
+    _flat("facets", _latency(facets, repeat), out)
+
+    # Keyset pages: every page costs the same, wherever it is
+    pages, cursor = [], None
+    for _ in range(repeat + 1):
+        t = time.perf_counter()
+        body = get("/search", {"paging": "cursor", **({"cursor": cursor} if cursor else {})})
+        pages.append(time.perf_counter() - t)
+        cursor = body["next"]
+        if cursor is None:
+            break
+    pages = sorted(pages[1:] or pages)
+    out["cursor_walk.p50_ms"] = round(pages[len(pages) // 2] * 1000, 3)
+    return out
+
+
+def run_timeline(get, repeat: int) -> dict:
+    out = {}
+    _flat("spans", _latency(lambda: get("/timeline", {}), repeat), out)
+    _flat("histogram", _latency(lambda: get("/timeline/histogram", {}), repeat), out)
+    _flat("histogram_term", _latency(lambda: get("/timeline/histogram", {"q": "provider"}), repeat), out)
+    return out
+
+
+def run_export(client, headers: dict, rows: int) -> dict:
+    out = {}
+    for name, params in {"ndjson": {}, "csv": {"format": "csv"}}.items():
+        t = time.perf_counter()
+        with client.stream("GET", "/export", params=params, headers=headers) as r:
+            r.raise_for_status()
+            for _ in r.iter_raw():
+                pass
+        out[f"{name}_rows_per_s"] = round(rows / (time.perf_counter() - t))
+    return out
+
+
+def run_mark_read(client, headers: dict, repeat: int) -> dict:
+    updated, elapsed = 0, 0.0
+    for state in (True, False):
+        t = time.perf_counter()
+        r = client.patch("/logs/read", json={"filter": {"level": "INFO"}, "is_read": state}, headers=headers)
+        elapsed += time.perf_counter() - t
+        updated += r.json()["updated"]
+    ids = iter(range(1, repeat + 2))
+    single = _latency(lambda: client.patch(f"/logs/{next(ids)}/read", headers=headers).raise_for_status(), repeat)
+    return {"bulk_rows_per_s": round(updated / elapsed) if elapsed else 0, **{f"single.{k}": v for k, v in single.items()}}
+
+
+def compare(metrics: dict, baseline: dict, threshold: float, overrides: dict, min_ms: float) -> list[dict]:
+    """Metrics worse than `baseline` by more than their threshold (relative change)."""
+    regressions = []
+    for name, base in baseline.items():
+        cur = metrics.get(name)
+        if cur is None or not base:
+            continue
+        if name.endswith("_per_s"):
+            change = (base - cur) / base
+        elif name.endswith("_ms"):
+            if cur - base < min_ms or (name.endswith("p95_ms") and name not in overrides):
+                continue
+            change = (cur - base) / base
+        else:
+            continue
+        limit = overrides.get(name, threshold)
+        if change > limit:
+            regressions.append({"metric": name, "baseline": base, "current": cur,
+                                "change": round(change, 3), "threshold": limit})
+    return regressions
+
+
+def _overrides(specs: list[str], ap: argparse.ArgumentParser) -> dict:
+    out = {}
+    for spec in specs:
+        name, sep, value = spec.partition("=")
+        try:
+            out[name] = float(value)
+        except ValueError:
+            sep = ""
+        if not sep:
+            ap.error(f"--metric-threshold expects name=fraction, got {spec!r}")
+    return out
+
+
+def main(argv: list[str] | None = None) -> dict:
+    ap = argparse.ArgumentParser(prog="python -m bench.suite")
+    add_arguments(ap)
+    ap.add_argument("--only", help=f"comma-separated subset of: {', '.join(SCENARIOS)} (import always runs)")
+    ap.add_argument("--repeat", type=int, default=20, help="timed calls per latency metric")
+    ap.add_argument("--out", help="write the results JSON here")
+    ap.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown per metric")
+    ap.add_argument("--metric-threshold", action="append", default=[], metavar="NAME=FRACTION",
+                    help="per-metric override of --threshold")
+    ap.add_argument("--min-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    args = ap.parse_args(argv)
+    only = set(SCENARIOS) if not args.only else {s.strip() for s in args.only.split(",")}
+    if only - set(SCENARIOS):
+        ap.error(f"unknown scenarios: {', '.join(sorted(only - set(SCENARIOS)))}")
+    overrides = _overrides(args.metric_threshold, ap)
+    corpus = {"rows": args.rows, "form": args.form, **corpus_kwargs(args)}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("corpus") != corpus:
+            ap.error("baseline was measured on a different corpus; use the same corpus options")
+
+    # Before any api import: engines and caches read these at import time
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "suite.db")
+    os.environ["RESPONSE_CACHE_BYTES"] = "0"
+    os.environ.setdefault("RATE_LIMIT", str(1 << 30))
+    from fastapi.testclient import TestClient
+    from api.db import init_db
+    from api.main import app
+    init_db()
+
+    records = list(generate(args.rows, **corpus_kwargs(args)))
+    metrics: dict = {}
+    if "sanitize" in only:
+        _flat("sanitize", run_sanitize(records), metrics)
+    _flat("import", run_import(encode(records, args.form), args.rows), metrics)
+    probes = _probes(records)
+    del records
+
+    client = TestClient(app)
+    headers = {"X-API-Key": os.getenv("API_KEY", "dev-key-123")}
+
+    def get(path: str, params: dict):
+        r = client.get(path, params=params, headers=headers)
+        r.raise_for_status()
+        return r.json()
+
+    if "search" in only:
+        _flat("search", run_search(get, probes, args.rows, args.repeat), metrics)
+    if "timeline" in only:
+        _flat("timeline", run_timeline(get, args.repeat), metrics)
+    if "export" in only:
+        _flat("export", run_export(client, headers, args.rows), metrics)
+    if "mark_read" in only:
+        _flat("mark_read", run_mark_read(client, headers, args.repeat), metrics)
+
+    out = {
+        "meta": {
+            "commit": _commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "corpus": corpus,
+            "repeat": args.repeat,
+        },
+        "metrics": metrics,
+    }
+    if baseline is not None:
+        out["baseline"] = baseline["meta"].get("commit")
+        out["regressions"] = compare(metrics, baseline["metrics"], args.threshold, overrides, args.min_ms)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(out, f, indent=2)
+    print(json.dumps(out))
+    return out
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main().get("regressions") else 0)
@@ -0,0 +1,140 @@
+# Batched writer for imports.
+# - Collects normalized rows and inserts `logs` / `bodies` with executemany-style
+#   Core statements instead of one ORM add + flush per record.
+# - Log ids are derived from last_insert_rowid() after one executemany (consecutive
+#   under the write lock) and key the compressed `payloads` rows (and `bodies`)
+#   inserted after them.
+# - Bodies go through api.body_store: repeated contents are stored once, and
+#   hashes already resolved in the current transaction skip the lookup.
+# - Extracted tflog attributes (row["fields"]) go to `log_fields` keyed the same way,
+#   with their interned value ids cached for the whole import.
+# - Each batch's id range is recorded for the import run (api.runs) when `run_id` is set.
+# - Commits every `commit_every` rows so a huge import never holds one giant transaction,
+#   and early, after the current batch, when another writer (mark-read, demo seed, the
+#   FTS indexer) is queued for the single writer connection; it then waits for that
+#   writer to take the connection before continuing.
+# - With `defer_fts` the per-row FTS trigger is paused and each committed id range is
+#   queued for api.fts.index_pending() instead.
+# - Each commit folds the new rows into the /timeline summary (api.timeline.refresh)
+#   and bumps the data generation so cached aggregates are recomputed.
+# - Per-batch seconds of each statement group (and of the rows' normalization when the
+#   caller passes `self.timings` to _build_row) go to api.metrics.
+
+import time
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from api import body_store, cache, fields, fts, metrics, runs, timeline
+from api.compression import pack
+from api.db import writer_waiting, yield_writer
+from api.models import Log, Body, Payload
+
+BATCH_SIZE = 1000
+COMMIT_EVERY = 50_000
+
+_logs = Log.__table__
+_bodies = Body.__table__
+_payloads = Payload.__table__
+
+
+class BulkWriter:
+    """Buffer of pending rows flushed to SQLite in batches."""
+
+    def __init__(
+        self,
+        db: Session,
+        batch_size: int = BATCH_SIZE,
+        commit_every: int = COMMIT_EVERY,
+        defer_fts: bool = False,
+        run_id: int | None = None,
+    ):
+        self.db = db
+        self.defer_fts = defer_fts
+        self.run_id = run_id
+        self.batch_size = max(1, batch_size)
+        self.commit_every = max(self.batch_size, commit_every)
+        self.written = 0  # rows flushed to the DB
+        self.committed = 0  # rows made durable
+        self._rows: list[dict] = []
+        self._payloads: list[bytes] = []
+        self._bodies: list[tuple[int, str | None, str | None]] = []  # (batch index, req, res)
+        self._fields: list[tuple[int, str, str]] = []  # (batch index, name, value)
+        self._value_ids: dict[tuple[str, str], int] = {}  # extracted (name, value) -> field_values id
+        self._blob_ids: dict[bytes, int] = {}  # body hash -> blob id, valid until commit
+        self._paused_at: int | None = None  # last log id before this transaction while FTS is paused
+        self.timings = metrics.stages()  # seconds per import stage for the current batch
+
+    def add(self, row: dict, bodies: tuple[str | None, str | None] | None = None) -> None:
+        """
+        Queue one `logs` row and its optional (req_json, res_json) bodies.
+        The row's payload is `raw_z` (already compressed) or `raw_json` (compressed here).
+        """
+        raw_z = row.pop("raw_z", None)
+        self._payloads.append(raw_z if raw_z is not None else pack(row.pop("raw_json")))
+        i = len(self._rows)
+        self._fields += [(i, name, value) for name, value in row.pop("fields", ())]
+        if bodies is not None:
+            self._bodies.append((i, bodies[0], bodies[1]))
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending batch; commit once `commit_every` rows are outstanding."""
+        if not self._rows:
+            return
+        timings = self.timings
+        t0 = time.perf_counter()
+        conn = self.db.connection()
+        if self.defer_fts and self._paused_at is None:
+            self._paused_at = fts.pause(conn)
+        # INSERT ... RETURNING with ordered results runs one statement per row on SQLite
+        conn.execute(insert(_logs), self._rows)
+        last = conn.exec_driver_sql("SELECT last_insert_rowid()").scalar()
+        ids = range(last - len(self._rows) + 1, last + 1)
+        if self.run_id is not None:
+            ts = [row["ts_us"] for row in self._rows]
+            runs.add_range(conn, self.run_id, ids[0], ids[-1], min(ts), max(ts))
+        t1 = time.perf_counter()
+        conn.execute(insert(_payloads), [
+            {"log_id": log_id, "raw_z": raw_z} for log_id, raw_z in zip(ids, self._payloads)
+        ])
+        t2 = time.perf_counter()
+        if self._bodies:
+            blob_ids = body_store.put_many(
+                conn, [t for _, req, res in self._bodies for t in (req, res)], self._blob_ids
+            )
+            conn.execute(insert(_bodies), [
+                {"log_id": ids[i], "req_blob_id": blob_ids[2 * k], "res_blob_id": blob_ids[2 * k + 1]}
+                for k, (i, _, _) in enumerate(self._bodies)
+            ])
+        t3 = time.perf_counter()
+        fields.insert(conn, [(ids[i], name, value) for i, name, value in self._fields], self._value_ids)
+        timings["logs"] += t1 - t0
+        timings["payloads"] += t2 - t1
+        timings["bodies"] += t3 - t2
+        timings["fields"] += time.perf_counter() - t3
+        metrics.observe_stages(timings)
+        metrics.import_records.inc(by=len(self._rows))
+        self.written += len(self._rows)
+        self._rows.clear()
+        self._payloads.clear()
+        self._bodies.clear()
+        self._fields.clear()
+        if self.written - self.committed >= self.commit_every or writer_waiting():
+            self.commit()
+
+    def commit(self) -> None:
+        """Flush and commit; queues the transaction's id range when FTS is deferred."""
+        self.flush()
+        t = time.perf_counter()
+        if self._paused_at is not None:
+            fts.resume(self.db.connection(), self._paused_at)
+            self._paused_at = None
+        timeline.refresh(self.db.connection())
+        cache.bump(self.db.connection())
+        self.db.commit()
+        metrics.import_stage_seconds.observe(time.perf_counter() - t, "commit")
+        self._blob_ids.clear()
+        self.committed = self.written
+        if writer_waiting():
+            yield_writer()
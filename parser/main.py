@@ -2,18 +2,42 @@
 # - Accepts both NDJSON (one JSON object per line) and a JSON array.
 # - Supports keys with leading '@' used by tflog: @level, @message, @timestamp.
 # - Robust to empty/garbled lines: skips them instead of failing the whole import.
+# - Streaming mode reads the upload in chunks so memory stays flat for multi-GB files.
 
 import json
 import io
-from typing import Any, Iterable
+import asyncio
+import re
+import codecs
+import inspect
+import contextlib
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterable
 from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from api.models import Log, Body
 from .security_sanitizer import sanitize_dict
+from .timestamps import to_epoch_us, now_epoch_us
+from .bulk_writer import BulkWriter, BATCH_SIZE
+from api.fts import index_pending
+from api import body_store, cache, fields, metrics, runs, timeline
 
 
 # ---------- Helpers: field extraction ----------
 
+# Candidate keys per field, in priority order
+_LEVEL_KEYS = ("level", "lvl", "severity", "@level")
+_MSG_KEYS = ("summary", "msg", "message", "@message")
+_TS_KEYS = ("timestamp", "ts", "@timestamp")
+_REQ_ID_KEYS = ("tf_req_id", "req_id", "request_id", "x-request-id")
+_REQ_BODY_KEYS = ("tf_http_req_body", "http_req_body")
+_RES_BODY_KEYS = ("tf_http_res_body", "http_res_body")
+_LEVEL_WORDS = ("error", "warn", "info", "debug", "trace")
+
+
 def _first(d: dict, *candidates: str, default=None):
     """Return the first present value for any of the candidate keys."""
     for k in candidates:
@@ -22,6 +46,10 @@ def _first(d: dict, *candidates: str, default=None):
     return default
 
 
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False)
+
+
 def _iso(ts: str | None) -> str:
     """Normalize timestamp string to ISO8601; fallback to current UTC."""
     if not ts:
@@ -30,21 +58,25 @@ def _iso(ts: str | None) -> str:
     return ts
 
 
+def _level_from_text(dumped: str) -> str:
+    """First severity keyword found in a serialized record."""
+    low = dumped.lower()
+    for key in _LEVEL_WORDS:
+        if key in low:
+            return key.upper()
+    return "INFO"
+
+
 def _level(rec: dict) -> str:
     """Pick level from normal or '@' keys; else infer from message text."""
-    lv = _first(rec, "level", "lvl", "severity", "@level")
+    lv = _first(rec, *_LEVEL_KEYS)
     if isinstance(lv, str):
         return lv.upper()
-    msg = json.dumps(rec, ensure_ascii=False).lower()
-    for key in ("error", "warn", "info", "debug", "trace"):
-        if key in msg:
-            return key.upper()
-    return "INFO"
+    return _level_from_text(_dumps(rec))
 
 
-def _section(rec: dict) -> str | None:
-    """Heuristic for terraform phases based on message text."""
-    msg = _first(rec, "summary", "msg", "message", "@message", default="")
+def _phase(msg: Any) -> str | None:
+    """Terraform phase marker (plan/apply start/end) in a message, if any."""
     if not isinstance(msg, str):
         msg = str(msg)
     low = msg.lower()
@@ -56,110 +88,472 @@ def _section(rec: dict) -> str | None:
         return "apply_start"
     if "apply" in low and "end" in low:
         return "apply_end"
-    return rec.get("section")
+    return None
+
+
+def _section(rec: dict) -> str | None:
+    """Heuristic for terraform phases based on message text."""
+    return _phase(_first(rec, *_MSG_KEYS, default="")) or rec.get("section")
 
 
 def _req_id(rec: dict) -> str | None:
     """Extract request correlation id if present (usually not in tflog)."""
-    return _first(rec, "tf_req_id", "req_id", "request_id", "x-request-id")
+    return _first(rec, *_REQ_ID_KEYS)
+
+
+def _summary_text(text: Any) -> str:
+    return str(text).replace("\n", " ")[:150]
 
 
 def _summary(rec: dict) -> str:
     """Short summary line used in lists."""
-    text = _first(rec, "summary", "msg", "message", "@message", default="")
+    text = _first(rec, *_MSG_KEYS, default="")
     if not text:
-        text = json.dumps(rec, ensure_ascii=False)
-    text = str(text).replace("\n", " ")
-    return text[:150]
+        text = _dumps(rec)
+    return _summary_text(text)
 
 
 def _extract_bodies(rec: dict) -> tuple[Any | None, Any | None]:
     """Move potential request/response bodies into the bodies table."""
-    req = _first(rec, "tf_http_req_body", "http_req_body")
-    res = _first(rec, "tf_http_res_body", "http_res_body")
+    req = _first(rec, *_REQ_BODY_KEYS)
+    res = _first(rec, *_RES_BODY_KEYS)
     return req, res
 
 
+def _first_key(d: dict, candidates: tuple[str, ...]) -> str | None:
+    for k in candidates:
+        if k in d:
+            return k
+    return None
+
+
+# Stand-in for already serialized body values inside raw_json; random per process
+# so it cannot collide with record content.
+_SPLICE = f"__splice_{uuid.uuid4().hex}__"
+
+
 # ---------- Core import functions ----------
 
-def _save_record(rec: dict, db: Session, count_ref: list[int]) -> None:
+def _build_row(rec: dict, timings: dict[str, float] | None = None) -> tuple[dict, tuple[str | None, str | None] | None]:
     """
-    Sanitize a record and insert into DB.
-    `count_ref` is a single-element list used to increment imported count by reference.
+    Sanitize a record and map it to `logs` column values in one pass.
+    Returns (row, bodies) where bodies is (req_json, res_json) or None.
+    Same output as the per-field helpers above, but every candidate key is
+    looked up once and each object is serialized at most once: body JSON is
+    spliced into raw_json, and the unsanitized dump needed by the level /
+    summary fallbacks is shared (or taken from raw_json when nothing was redacted).
+    `timings` (api.metrics.stages()) accumulates sanitize/normalize/extract seconds.
     """
+    t0 = time.perf_counter()
     clean = sanitize_dict(rec)
-    req, res = _extract_bodies(clean)
-
-    ts_raw = _first(rec, "timestamp", "ts", "@timestamp")
-    row = Log(
-        ts=_iso(ts_raw),
-        level=_level(rec),
-        section=_section(rec),
-        tf_req_id=_req_id(rec),
-        summary=_summary(rec),
+    t1 = time.perf_counter()
+
+    req_key = _first_key(clean, _REQ_BODY_KEYS)
+    res_key = _first_key(clean, _RES_BODY_KEYS)
+    req = clean[req_key] if req_key else None
+    res = clean[res_key] if res_key else None
+    req_json = _dumps(req) if req is not None else None
+    res_json = _dumps(res) if res is not None else None
+
+    if req_json is None and res_json is None:
+        raw_json = _dumps(clean)
+    else:
+        shell = dict(clean)
+        spliced = []
+        for key, dumped in ((req_key, req_json), (res_key, res_json)):
+            if dumped is not None:
+                marker = f"{_SPLICE}{key}"
+                shell[key] = marker
+                spliced.append((_dumps(marker), dumped))
+        raw_json = _dumps(shell)
+        for marker, dumped in spliced:
+            raw_json = raw_json.replace(marker, dumped, 1)
+
+    rec_json = raw_json if clean is rec else None
+
+    lv = _first(rec, *_LEVEL_KEYS)
+    if isinstance(lv, str):
+        level = lv.upper()
+    else:
+        rec_json = rec_json or _dumps(rec)
+        level = _level_from_text(rec_json)
+
+    msg = _first(rec, *_MSG_KEYS, default="")
+    if not msg:
+        rec_json = rec_json or _dumps(rec)
+    ts = _iso(_first(rec, *_TS_KEYS))
+    ts_us = to_epoch_us(ts)
+    row = dict(
+        ts=ts,
+        ts_us=now_epoch_us() if ts_us is None else ts_us,
+        level=level,
+        section=_phase(msg) or rec.get("section"),
+        tf_req_id=_first(rec, *_REQ_ID_KEYS),
+        summary=_summary_text(msg or rec_json),
         has_req_body=bool(req),
         has_res_body=bool(res),
-        raw_json=json.dumps(clean, ensure_ascii=False),
+        is_read=False,
+        raw_json=raw_json,
     )
+    t2 = time.perf_counter()
+    row["fields"] = fields.extract(clean)  # (name, value) pairs for log_fields, not a logs column
+    if timings is not None:
+        timings["sanitize"] += t1 - t0
+        timings["normalize"] += t2 - t1
+        timings["extract"] += time.perf_counter() - t2
+    bodies = None
+    if req is not None or res is not None:
+        bodies = (req_json, res_json)
+    return row, bodies
+
+
+def _save_record(rec: dict, db: Session, count_ref: list[int], run_id: int | None = None,
+                 timings: dict[str, float] | None = None) -> None:
+    """
+    Sanitize a record and insert into DB.
+    `count_ref` is a single-element list used to increment imported count by reference.
+    """
+    values, bodies = _build_row(rec, timings)
+    t = time.perf_counter()
+    extracted = values.pop("fields")
+    row = Log(**values)
     db.add(row)
     db.flush()  # get row.id
+    fields.insert(db.connection(), [(row.id, name, value) for name, value in extracted])
+    if run_id is not None:
+        runs.add_range(db.connection(), run_id, row.id, row.id, row.ts_us, row.ts_us)
 
-    if req is not None or res is not None:
-        db.add(
-            Body(
-                log_id=row.id,
-                req_body_json=json.dumps(req, ensure_ascii=False) if req is not None else None,
-                res_body_json=json.dumps(res, ensure_ascii=False) if res is not None else None,
-            )
-        )
+    if bodies is not None:
+        req_id, res_id = body_store.put_many(db.connection(), list(bodies))
+        db.add(Body(log_id=row.id, req_blob_id=req_id, res_blob_id=res_id))
 
+    if timings is not None:
+        timings["orm_flush"] += time.perf_counter() - t
     count_ref[0] += 1
 
 
+def _loads_line(line: str) -> dict | None:
+    """Decode one NDJSON line; None for empty/invalid/non-object lines."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        obj = json.loads(line)
+    except json.JSONDecodeError:
+        # Skip malformed line
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
 def _iter_ndjson(text: str) -> Iterable[dict]:
     """Yield JSON objects from NDJSON, skipping empty/invalid lines."""
     for line in io.StringIO(text):
-        line = line.strip()
-        if not line:
-            continue
+        obj = _loads_line(line)
+        if obj is not None:
+            yield obj
+
+
+# ---------- Streaming readers ----------
+
+CHUNK_SIZE = 1 << 20  # 1 MiB per read from the upload
+
+_DECODER = json.JSONDecoder()
+_ARRAY_SEP = re.compile(r"[\s,]*")
+# `{"records": [` wrapper emitted by some exporters
+_RECORDS_WRAPPER = re.compile(r'\{\s*"records"\s*:\s*\[')
+_SNIFF_CHARS = 64
+
+
+@dataclass
+class ImportProgress:
+    """Running counters of an import; safe to poll while the import runs."""
+    bytes_read: int = 0
+    records: int = 0
+    run_id: int | None = None  # api.runs entry, set once the import starts
+
+
+async def _settle(task: asyncio.Future) -> None:
+    """Wait until `task` is done, even if the caller is cancelled meanwhile (without cancelling it)."""
+    while not task.done():
         try:
-            obj = json.loads(line)
-            if isinstance(obj, dict):
-                yield obj
-        except json.JSONDecodeError:
-            # Skip malformed line
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            continue
+
+
+async def _in_thread(fn, *args):
+    """
+    asyncio.to_thread() that returns or raises only once `fn` is done: a cancel
+    arriving meanwhile is re-raised afterwards, so the session `fn` uses is free again.
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await _settle(task)
+        raise
+
+
+async def _read(file_like, size: int):
+    """Read from an async (UploadFile) or plain sync file object."""
+    data = file_like.read(size)
+    if inspect.isawaitable(data):
+        data = await data
+    return data
+
+
+async def _iter_chunks(file_like, progress: ImportProgress, chunk_size: int) -> AsyncIterator[str]:
+    """Yield decoded text chunks; multi-byte chars split across reads are kept intact."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    while True:
+        raw = await _read(file_like, chunk_size)
+        if not raw:
+            break
+        progress.bytes_read += len(raw)
+        text = decoder.decode(raw) if isinstance(raw, (bytes, bytearray)) else raw
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _aiter_ndjson(chunks: AsyncIterator[str], buf: str, raw: bool = False) -> AsyncIterator[dict | str]:
+    """
+    Yield objects line by line; only the current partial line is buffered.
+    With `raw=True` non-empty lines are yielded undecoded (decoding happens in workers).
+    """
+    async def _with_head():
+        yield buf
+        async for chunk in chunks:
+            yield chunk
+
+    def _emit(line: str):
+        if raw:
+            line = line.strip()
+            return line or None
+        return _loads_line(line)
+
+    pending: list[str] = []
+    async for chunk in _with_head():
+        pending.append(chunk)
+        if "\n" not in chunk:
             continue
+        lines = "".join(pending).split("\n")
+        pending = [lines.pop()]
+        for line in lines:
+            obj = _emit(line)
+            if obj is not None:
+                yield obj
+    obj = _emit("".join(pending))
+    if obj is not None:
+        yield obj
 
 
-async def import_file_like(file_like, db: Session) -> int:
+async def _aiter_array(chunks: AsyncIterator[str], buf: str) -> AsyncIterator[dict]:
+    """
+    Yield the elements of a JSON array one at a time.
+    `buf` starts right after the opening '['. Consumed text is dropped from the
+    buffer, so memory is bounded by the largest single element.
+    """
+    pos, eof = 0, False
+    want = 0  # buffered chars needed before retrying an incomplete element
+    while True:
+        pos = _ARRAY_SEP.match(buf, pos).end()
+        if pos < len(buf) and (eof or len(buf) - pos >= want):
+            if buf[pos] == "]":
+                return
+            try:
+                obj, pos = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Element continues in the next chunk; grow geometrically so a
+                # huge element is not re-parsed once per chunk.
+                want = 2 * (len(buf) - pos)
+            else:
+                want = 0
+                if isinstance(obj, dict):
+                    yield obj
+                continue
+        elif eof:
+            raise json.JSONDecodeError("Unterminated JSON array", buf, pos)
+        buf, pos = buf[pos:], 0
+        chunk = await anext(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buf += chunk
+
+
+async def iter_records(
+    file_like, progress: ImportProgress | None = None, chunk_size: int = CHUNK_SIZE, raw: bool = False
+) -> AsyncIterator[dict | str]:
+    """
+    Stream records from NDJSON, a JSON array or a {"records": [...]} wrapper.
+    The format is sniffed from the first non-whitespace characters.
+    `raw=True` leaves NDJSON lines undecoded (see parser.pipeline); array
+    elements are always decoded since finding their end requires parsing.
+    """
+    progress = progress if progress is not None else ImportProgress()
+    chunks = _iter_chunks(file_like, progress, chunk_size)
+    buf = ""
+    async for chunk in chunks:
+        buf += chunk
+        if len(buf.lstrip()) >= _SNIFF_CHARS:
+            break
+    buf = buf.lstrip()
+
+    if buf.startswith("["):
+        records = _aiter_array(chunks, buf[1:])
+    elif (m := _RECORDS_WRAPPER.match(buf)):
+        records = _aiter_array(chunks, buf[m.end():])
+    else:
+        records = _aiter_ndjson(chunks, buf, raw)
+    async for rec in records:
+        yield rec
+
+
+def _finish_bulk(db: Session, bulk: BulkWriter, fts_index: str) -> None:
+    """Commit the last chunk and run the deferred FTS pass if requested."""
+    bulk.commit()
+    if fts_index == "deferred":
+        t = time.perf_counter()
+        index_pending(db.connection())
+        db.commit()
+        metrics.import_stage_seconds.observe(time.perf_counter() - t, "fts_index")
+
+
+def _open_run(db: Session, filename: str | None, progress: ImportProgress) -> int:
+    # Set here, not by the caller: a cancel while this runs must still see the id
+    run_id = progress.run_id = runs.start(db.connection(), filename)
+    db.commit()
+    return run_id
+
+
+def _close_run(db: Session, run_id: int, status: str, bytes_read: int) -> None:
+    runs.finish(db.connection(), run_id, status, bytes_read)
+    db.commit()
+
+
+def _finish_orm(db: Session, timings: dict[str, float], pending: int) -> None:
+    """Commit the ORM writer's rows; `pending` records are not yet in import_records."""
+    t = time.perf_counter()
+    timeline.refresh(db.connection())
+    cache.bump(db.connection())
+    db.commit()
+    timings["commit"] += time.perf_counter() - t
+    metrics.observe_stages(timings)
+    metrics.import_records.inc(by=pending)
+
+
+def _abort(db: Session, run_id: int | None, status: str, bytes_read: int) -> None:
+    """Roll back the uncommitted chunk and close the run as failed/cancelled."""
+    db.rollback()
+    if run_id is not None:
+        with contextlib.suppress(SQLAlchemyError):  # keep the import's own error
+            _close_run(db, run_id, status, bytes_read)
+
+
+async def import_file_like(
+    file_like,
+    db: Session,
+    *,
+    stream: bool = False,
+    progress: ImportProgress | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    writer: str = "orm",
+    batch_size: int = BATCH_SIZE,
+    fts_index: str = "trigger",
+    workers: int | None = None,
+    chunk_records: int | None = None,
+) -> int:
     """
     Import a file that can be NDJSON (tflog style) or a JSON array of objects.
+    With `stream=True` the file is read in `chunk_size` pieces and records are
+    saved as they are decoded; `progress` is updated along the way.
+    `writer="bulk"` batches inserts through BulkWriter, which commits in chunks:
+    on error only the uncommitted chunk is rolled back.
+    `fts_index` (bulk writer only): "trigger" indexes row by row, "deferred" skips the
+    trigger and indexes the new ids in one pass after commit, "background" leaves
+    them to api.fts.background_indexer.
+    Streaming + bulk runs through parser.pipeline: `workers` processes decode and
+    normalize `chunk_records`-sized chunks off the event loop (env defaults).
+    Every call is recorded as an import run (api.runs); its id is `progress.run_id`.
     Returns the number of successfully imported records.
     """
-    raw = await file_like.read()
-    text = raw.decode("utf-8", errors="ignore").strip()
-
+    progress = progress if progress is not None else ImportProgress()
+    progress.run_id = None
     imported = [0]  # list used as reference
+    run_id = None
+    bulk = None
+
+    timings = metrics.stages()  # ORM writer; BulkWriter observes its own per batch
+
+    def save(rec: dict) -> None:
+        if bulk is None:
+            _save_record(rec, db, imported, run_id, timings)
+            if imported[0] % BATCH_SIZE == 0:
+                metrics.observe_stages(timings)
+                metrics.import_records.inc(by=BATCH_SIZE)
+        else:
+            bulk.add(*_build_row(rec, bulk.timings))
+            imported[0] += 1
+        progress.records = imported[0]
 
     try:
-        # Fast path for JSON array: starts with '['
-        if text.startswith("["):
-            data = json.loads(text)
-            if isinstance(data, dict) and "records" in data:
-                data = data["records"]
-            if isinstance(data, list):
-                for rec in data:
-                    if isinstance(rec, dict):
-                        _save_record(rec, db, imported)
+        # Off the event loop: the writer connection may be busy with another import's commit.
+        # Thread calls go through _in_thread: a cancel must not roll back under them
+        run_id = await _in_thread(_open_run, db, getattr(file_like, "filename", None), progress)
+        if writer == "bulk":
+            bulk = BulkWriter(db, batch_size=batch_size, defer_fts=fts_index != "trigger", run_id=run_id)
 
+        if bulk is not None and stream:
+            from .pipeline import run_pipeline
+            imported[0] = await run_pipeline(
+                file_like, bulk, progress, workers=workers,
+                chunk_records=chunk_records, chunk_size=chunk_size,
+            )
+            await _in_thread(_finish_bulk, db, bulk, fts_index)
+            await _in_thread(_close_run, db, run_id, "done", progress.bytes_read)
+            return imported[0]
+
+        if stream:
+            async for rec in iter_records(file_like, progress, chunk_size):
+                save(rec)
         else:
-            # Treat as NDJSON (Terraform tflog typical)
-            for rec in _iter_ndjson(text):
-                _save_record(rec, db, imported)
+            raw = await _read(file_like, -1)
+            progress.bytes_read = len(raw)
+            text = raw.decode("utf-8", errors="ignore").strip()
 
-        db.commit()
+            # Fast path for JSON array: starts with '['
+            if text.startswith("["):
+                data = json.loads(text)
+                if isinstance(data, dict) and "records" in data:
+                    data = data["records"]
+                if isinstance(data, list):
+                    for rec in data:
+                        if isinstance(rec, dict):
+                            save(rec)
+
+            else:
+                # Treat as NDJSON (Terraform tflog typical)
+                for rec in _iter_ndjson(text):
+                    save(rec)
+
+        if bulk is not None:
+            await _in_thread(_finish_bulk, db, bulk, fts_index)
+        else:
+            await _in_thread(_finish_orm, db, timings, imported[0] % BATCH_SIZE)
+        await _in_thread(_close_run, db, run_id, "done", progress.bytes_read)
         return imported[0]
 
-    except Exception:
-        db.rollback()
-        raise
\ No newline at end of file
+    except BaseException as e:
+        # Also on cancellation: only the chunk not yet committed is lost.
+        # Settled, not awaited: a second cancel must not leave the rollback running
+        status = "cancelled" if isinstance(e, asyncio.CancelledError) else "failed"
+        task = asyncio.ensure_future(asyncio.to_thread(_abort, db, progress.run_id, status, progress.bytes_read))
+        await _settle(task)
+        if not task.cancelled():
+            task.exception()  # retrieved: the import's own error is the one raised
+        raise
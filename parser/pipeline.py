@@ -0,0 +1,133 @@
+# Parallel import pipeline.
+# - The event loop only reads the upload and cuts it into chunks of records
+#   (raw NDJSON lines, or decoded objects for JSON arrays).
+# - Chunks are decoded, sanitized, normalized and their payload compressed in a
+#   process pool (IMPORT_WORKERS; 0 = a single background thread).
+# - One writer task takes results strictly in submission order and feeds the
+#   BulkWriter from a worker thread, so ids and row order match a serial import.
+# - The queue between them is bounded: when the writer falls behind, reading stops.
+# - Workers return each chunk's per-stage seconds with its rows; the writer task records
+#   them in api.metrics (worker processes have their own, unscraped, registries).
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from api import metrics
+from api.compression import pack
+from .bulk_writer import BulkWriter
+from .main import CHUNK_SIZE, ImportProgress, _build_row, _loads_line, _settle, iter_records
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "0"))
+IMPORT_CHUNK_RECORDS = int(os.getenv("IMPORT_CHUNK_RECORDS", "2000"))
+
+_pools: dict[int, ProcessPoolExecutor] = {}
+
+
+def _pool(workers: int) -> Executor | None:
+    """Shared process pool per size; None means the loop's default thread pool."""
+    if workers <= 0:
+        return None
+    if workers not in _pools:
+        # spawn: forking a threaded server process is not safe
+        _pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pools[workers]
+
+
+def shutdown_pools() -> None:
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+
+def _normalize_chunk(items: list) -> tuple[list[tuple[dict, tuple | None]], dict[str, float]]:
+    """Worker side: decode NDJSON lines and map every record to (row, bodies), plus stage seconds."""
+    out = []
+    timings = metrics.stages()
+    clock = time.perf_counter
+    for item in items:
+        t = clock()
+        rec = _loads_line(item) if isinstance(item, str) else item
+        timings["decode"] += clock() - t
+        if rec is not None:
+            row, bodies = _build_row(rec, timings)
+            t = clock()
+            row["raw_z"] = pack(row.pop("raw_json"))
+            timings["compress"] += clock() - t
+            out.append((row, bodies))
+    return out, timings
+
+
+def _write_rows(bulk: BulkWriter, rows: list) -> None:
+    for row, bodies in rows:
+        bulk.add(row, bodies)
+
+
+async def _writer(queue: asyncio.Queue, bulk: BulkWriter, progress: ImportProgress) -> int:
+    written = 0
+    while True:
+        fut = await queue.get()
+        if fut is None:
+            return written
+        rows, timings = await fut
+        metrics.observe_stages(timings)
+        await asyncio.to_thread(_write_rows, bulk, rows)
+        written += len(rows)
+        progress.records = written
+
+
+async def run_pipeline(
+    file_like,
+    bulk: BulkWriter,
+    progress: ImportProgress,
+    *,
+    workers: int | None = None,
+    chunk_records: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """
+    Stream `file_like` through the pool into `bulk`. Returns records written.
+    The caller commits; on error or cancellation the writer is drained first (the
+    batch it is writing finishes) so the session is never used by two threads at once.
+    """
+    workers = IMPORT_WORKERS if workers is None else workers
+    chunk_records = max(1, chunk_records or IMPORT_CHUNK_RECORDS)
+    loop = asyncio.get_running_loop()
+    pool = _pool(workers)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(2, 2 * workers))
+    writer = asyncio.create_task(_writer(queue, bulk, progress))
+
+    async def put(item) -> None:
+        """Enqueue, waiting for room; surfaces a writer failure instead of blocking forever."""
+        putter = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait({putter, writer}, return_when=asyncio.FIRST_COMPLETED)
+        if not putter.done():
+            putter.cancel()
+            if item is not None:
+                item.cancel()
+            writer.result()  # re-raise the writer's error
+
+    try:
+        batch: list = []
+        async for item in iter_records(file_like, progress, chunk_size, raw=True):
+            batch.append(item)
+            if len(batch) >= chunk_records:
+                await put(loop.run_in_executor(pool, _normalize_chunk, batch))
+                batch = []
+        if batch:
+            await put(loop.run_in_executor(pool, _normalize_chunk, batch))
+        await put(None)
+        # Shielded: cancelling the writer would not stop its to_thread() call
+        return await asyncio.shield(writer)
+    except BaseException:
+        while not queue.empty():
+            fut = queue.get_nowait()
+            if fut is not None:
+                fut.cancel()
+        if not writer.done():
+            queue.put_nowait(None)
+            await _settle(writer)
+        if not writer.cancelled():
+            writer.exception()  # retrieved: the error being raised is the one that matters
+        raise
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from typing import Any
 
 # Key names that must be redacted regardless of value
@@ -8,24 +9,78 @@ _JWT = re.compile(r"^[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+$")
 # Long hex/base64-ish strings (likely secrets)
 _LONG_HEX_B64 = re.compile(r"([A-Fa-f0-9]{20,}|[A-Za-z0-9+/]{24,}={0,2})")
 
+_REDACTED = "[REDACTED]"
+# Shortest strings each pattern can match: "a.b.c" and 20 hex chars
+_JWT_MIN = 5
+_HEX_B64_MIN = 20
+KEY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _secret_key(k: str) -> bool:
+    """Verdict for a key name; tflog reuses a small set of keys, so this is mostly cache hits."""
+    return _SECRET_KEYS.search(k) is not None
+
+
+def _is_secret_key(k: Any) -> bool:
+    if type(k) is str:
+        return _secret_key(k)
+    return _SECRET_KEYS.search(str(k)) is not None
+
+
+def _looks_secret(v: str) -> bool:
+    n = len(v)
+    if n < _JWT_MIN:
+        return False
+    # JWT segments cannot contain '.', so a match needs exactly two dots
+    if v.count(".") == 2 and _JWT.match(v):
+        return True
+    return n >= _HEX_B64_MIN and _LONG_HEX_B64.search(v) is not None
+
+
 def _mask(v: str) -> str:
     """Mask suspicious token-like strings."""
-    if _JWT.match(v) or _LONG_HEX_B64.search(v):
-        return "[REDACTED]"
-    return v
+    return _REDACTED if _looks_secret(v) else v
+
+
+# Values that never need work; checked by exact type to stay on the fast path
+_SCALARS = frozenset((int, float, bool, type(None)))
+
+
+def _clean_value(v: Any) -> Any:
+    """Sanitized value, or `v` itself when nothing changed."""
+    t = type(v)
+    if t is str:
+        return _REDACTED if len(v) >= _JWT_MIN and _looks_secret(v) else v
+    if t in _SCALARS:
+        return v
+    return sanitize_dict(v)
+
 
 def sanitize_dict(d: Any) -> Any:
-    """Recursively redact secrets in dict/list/str values."""
+    """
+    Recursively redact secrets in dict/list/str values.
+    Containers are copied only when something inside them was redacted;
+    otherwise the original object is returned as is.
+    """
     if isinstance(d, dict):
-        out = {}
+        out = None
         for k, v in d.items():
-            if _SECRET_KEYS.search(str(k)):
-                out[k] = "[REDACTED]"
-            else:
-                out[k] = sanitize_dict(v)
-        return out
+            nv = _REDACTED if _is_secret_key(k) else _clean_value(v)
+            if nv is not v:
+                if out is None:
+                    out = dict(d)
+                out[k] = nv
+        return d if out is None else out
     if isinstance(d, list):
-        return [sanitize_dict(x) for x in d]
+        out = None
+        for i, v in enumerate(d):
+            nv = _clean_value(v)
+            if nv is not v:
+                if out is None:
+                    out = list(d)
+                out[i] = nv
+        return d if out is None else out
     if isinstance(d, str):
         return _mask(d)
-    return d
\ No newline at end of file
+    return d
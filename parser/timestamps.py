@@ -0,0 +1,79 @@
+# Timestamp normalization to integer epoch microseconds (UTC).
+# The original string is still stored in logs.ts for display; logs.ts_us is what
+# range filters, ordering and histograms use, so offsets and fraction widths
+# no longer affect comparisons.
+
+import math
+import re
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+# Older Pythons reject 'Z' and more than 6 fractional digits (Go's RFC3339Nano)
+_LONG_FRACTION = re.compile(r"(\.\d{6})\d+")
+# What from_epoch_us() can format (datetime years 1-9999)
+_MIN_US = (datetime.min.replace(tzinfo=timezone.utc) - _EPOCH) // _US
+_MAX_US = (datetime.max.replace(tzinfo=timezone.utc) - _EPOCH) // _US
+
+
+def _in_range(us: int) -> int | None:
+    return us if _MIN_US <= us <= _MAX_US else None
+
+
+def _from_number(v: float) -> int | None:
+    """Epoch number in s, ms, us or ns, guessed by magnitude; None if non-finite or out of range."""
+    if isinstance(v, float) and not math.isfinite(v):
+        return None  # json.loads accepts Infinity, NaN and 1e999
+    mag = abs(v)
+    if mag < 1e11:
+        return _in_range(int(v * 1_000_000))
+    if mag < 1e14:
+        return _in_range(int(v * 1_000))
+    if mag < 1e17:
+        return _in_range(int(v))
+    return _in_range(int(v // 1_000))
+
+
+def to_epoch_us(value) -> int | None:
+    """
+    ISO8601 string or epoch number -> UTC epoch microseconds; None if unparsable
+    or outside what from_epoch_us() can format back.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return _from_number(value)
+    if not isinstance(value, str):
+        return None
+    s = value.strip()
+    if not s:
+        return None
+    try:
+        return _from_number(float(s))
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        try:
+            dt = datetime.fromisoformat(_LONG_FRACTION.sub(r"\1", s).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)  # naive timestamps are taken as UTC
+    return _in_range((dt - _EPOCH) // _US)
+
+
+def now_epoch_us() -> int:
+    return (datetime.now(timezone.utc) - _EPOCH) // _US
+
+
+def from_epoch_us(us: int | None) -> str | None:
+    """
+    UTC ISO8601 with microseconds and 'Z'. Clamped to years 1-9999: derived values
+    such as histogram bucket starts can fall just outside what to_epoch_us() accepts.
+    """
+    if us is None:
+        return None
+    us = min(max(us, _MIN_US), _MAX_US)
+    return (_EPOCH + timedelta(microseconds=us)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
@@ -42,6 +42,35 @@ export async function importFile(file: File): Promise<ImportResult> {
   try { return JSON.parse(txt); } catch { return txt; }
 }
 
+// Background import: returns at once, poll getImportJob for progress
+export type ImportJob = {
+  id: string; filename: string;
+  status: "queued" | "running" | "done" | "failed" | "cancelled";
+  bytes_total: number; bytes_read: number; records: number; imported: number | null;
+  elapsed: number; records_per_s: number; bytes_per_s: number; eta_s: number | null;
+  error: string | null; run_id: number | null;
+};
+
+export async function startImportJob(file: File): Promise<ImportJob> {
+  const fd = new FormData();
+  fd.append("file", file, file.name);
+  const res = await fetch(`${API_BASE}/import/jobs`, {
+    method: "POST",
+    headers: { "X-API-Key": API_KEY ?? "" }, // no content-type for multipart
+    body: fd,
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return (await res.json()) as ImportJob;
+}
+
+export async function getImportJob(id: string): Promise<ImportJob> {
+  return apiFetch(`/import/jobs/${id}`);
+}
+
+export async function cancelImportJob(id: string): Promise<{ ok: boolean }> {
+  return apiFetch(`/import/jobs/${id}`, { method: "DELETE" });
+}
+
 // Optional: seed demo logs containing req/res bodies
 export async function seedDemo(): Promise<{ ok: boolean; inserted: number }> {
   return apiFetch(`/import/demo`, { method: "POST" });
@@ -65,9 +94,88 @@ export async function markRead(id: number, is_read: boolean) {
   });
 }
 
-// Fetch req/res body for a single log (used by LogRow on-demand expand)
+// Fetch req/res body previews for a single log (used by LogRow on-demand expand).
+// Only the first `preview` bytes are read server-side, so huge bodies open instantly.
+export type BodyPart = { part: "req" | "res"; json: string | null; size: number; truncated: boolean };
+
+export async function getLogBodyPart(
+  logId: number, part: "req" | "res", preview?: number, pretty = false
+): Promise<BodyPart> {
+  const usp = new URLSearchParams({ part });
+  if (preview) usp.set("preview", String(preview));
+  if (pretty) usp.set("pretty", "true");
+  return apiFetch(`/logs/${logId}/body?${usp.toString()}`);
+}
+
 export async function getLogBody(
-  logId: number
+  logId: number, preview = 200
 ): Promise<{ req?: unknown; res?: unknown }> {
-  return apiFetch(`/logs/${logId}/body`);
-}
\ No newline at end of file
+  const [req, res] = await Promise.all([
+    getLogBodyPart(logId, "req", preview),
+    getLogBodyPart(logId, "res", preview),
+  ]);
+  return { req: req.json ?? undefined, res: res.json ?? undefined };
+}
+
+// Mark many rows at once: explicit ids, or everything matching a /search filter
+export async function markReadBulk(
+  target: { ids?: number[]; filter?: Record<string, unknown> },
+  is_read: boolean
+): Promise<{ ok: boolean; updated: number }> {
+  return apiFetch(`/logs/read`, {
+    method: "PATCH",
+    body: JSON.stringify({ ...target, is_read }),
+  });
+}
+
+// Totals for a /search filter over all matching rows (not just the current page)
+export type Facets = {
+  total: number;
+  level: Record<string, number>;
+  section: Record<string, number>;
+  has_req_body: Record<"true" | "false", number>;
+  has_res_body: Record<"true" | "false", number>;
+  is_read: Record<"true" | "false", number>;
+};
+
+export async function getFacets(params: Record<string, unknown>): Promise<Facets> {
+  const usp = new URLSearchParams();
+  for (const [k, v] of Object.entries(params || {})) {
+    if (v === undefined || v === null || v === "") continue;
+    usp.set(k, String(v));
+  }
+  return apiFetch<Facets>(`/search/facets?${usp.toString()}`);
+}
+
+// Extracted tflog attributes (tf_rpc, @module, ...): names, and values with counts for dropdowns.
+// Filter with `field: ["tf_rpc:ApplyResourceChange", ...]` (a repeated name means any of them).
+export type FieldValues = { field: string; values: { value: string; count: number }[] };
+
+export async function listFields(): Promise<{ fields: string[] }> {
+  return apiFetch(`/search/fields`);
+}
+
+export async function getFieldValues(name: string, params: Record<string, unknown> = {}): Promise<FieldValues> {
+  const usp = new URLSearchParams();
+  for (const [k, v] of Object.entries(params)) {
+    if (v === undefined || v === null || v === "") continue;
+    for (const item of Array.isArray(v) ? v : [v]) usp.append(k, String(item));
+  }
+  return apiFetch<FieldValues>(`/search/fields/${encodeURIComponent(name)}?${usp.toString()}`);
+}
+
+// Import runs: one per upload/job; pass `run: id` as a filter, drop one to delete its rows.
+export type ImportRun = {
+  id: number; filename: string | null;
+  status: "running" | "done" | "failed" | "cancelled" | "deleting";
+  started: string; finished: string | null; records: number; bytes: number;
+  first: string | null; last: string | null;
+};
+
+export async function listRuns(): Promise<ImportRun[]> {
+  return apiFetch<ImportRun[]>(`/runs`);
+}
+
+export async function deleteRun(id: number): Promise<{ ok: boolean; deleted: number; vacuumed_pages: number }> {
+  return apiFetch(`/runs/${id}`, { method: "DELETE" });
+}